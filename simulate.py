@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+# coding=utf-8
+'''Runs game session without display (for load testing and bots)'''
+import yaml
+import src.system as internal
+from src.headless import Headless
+
+import logging
+Log = logging.getLogger('MainLogger')
+
+def main(args):
+    script = []
+    if args.script is not None:
+        with open(args.script) as file:
+            script = yaml.safe_load(file) or []
+    sim = Headless(args.map, args.players, args.units)
+    Log.info('Running {} ticks'.format(args.ticks))
+    try:
+        stats = sim.run(args.ticks, script)
+    finally:
+        sim.cleanup()
+    Log.info('Ticks: {ticks} in {seconds:.2f} s ({ticks_per_sec:.1f} ticks/s)'
+        .format(**stats))
+    Log.info('Tick time: mean {mean_tick_ms:.3f} ms, max {max_tick_ms:.3f} ms'
+        .format(**stats))
+    Log.info('Objects: {objects} ({active} active at end)'.format(**stats))
+    Log.info('Path cache: {}'.format(sim.session.board.path_cache.get_stats()))
+
+if __name__ == '__main__':
+    parser = internal.configure_sim_argparser()
+    args = parser.parse_args()
+    internal.define_loggable_exceptions()
+    internal.configure_logger(args.verbose)
+    main(args)
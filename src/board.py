@@ -1,79 +1,61 @@
-from numpy import array
-from random import randrange as rand
+from math import ceil
+from numpy import zeros, array, asarray, argwhere, argsort, searchsorted, \
+    isin, uint8, uint16, uint32
+from numpy.random import RandomState
 from PIL import Image
 from src.geometry import Point, Vector
+from src.footprint import PHASES
 from src.jps import Pathfinder
+from src.clearance import ClearanceMaps, MAX_CLEARANCE
+from src.mapfile import CompiledMap
+from src.chunks import ChunkedGrid
+from src.hpa import Hierarchy
+from src.flowfield import FlowField
+from src.pathing import PathJob
+from src.pathcache import PathCache
 
 import logging
 Log = logging.getLogger('MainLogger')
 
+MAX_OBJECT_ID = 65535 # Occupancy grid holds uint16 IDs
+
 class Cell:
-    '''Class represents board cell'''
-    def __init__(self, coords, crossable, size, var_count):
+    '''View of board cell (created on demand by Board.get)
+    Occupancy itself is held by board-wide arrays
+    '''
+    def __init__(self, board, coords):
+        self.board = board
         self.coords = coords
-        self.crossable = crossable
-        self.size = size
-        self.occupied = 0
-        self.sqr_occupier = None
-        self.subcells = [[None for x in range(size)] for y in range(size)]
-        self.variant = 'free' if self.crossable else 'obst'
-        self.variant += str(rand(0, var_count))
-        self.orig_variant = self.variant # When occupied, variant is changed
+        x, y = coords.get()
+        self.crossable = bool(board.crossable[y, x])
+        self.size = board.CORE.sub_per_cell
+        self.variant = ('free' if self.crossable else 'obst') + \
+            str(board.variants[y, x])
+
+    @property
+    def occupied(self):
+        '''0 - free, 1 - partially taken by round footprints, 2 - taken'''
+        x, y = self.coords.get()
+        if self.board.squares[y, x]:
+            return 2
+        return 1 if self.board.get_subcells(self.coords).any() else 0
+
+    @property
+    def sqr_occupier(self):
+        x, y = self.coords.get()
+        if not self.board.squares[y, x]:
+            return None
+        return self.board.get_by_id(self.board.get_subcells(self.coords)[0, 0])
+
+    def is_blocked(self):
+        '''Checks if cell is impassable for pathfinding'''
+        x, y = self.coords.get()
+        return not self.crossable or bool(self.board.squares[y, x])
 
     def get_object(self, subcoords):
-        if self.sqr_occupier is not None:
-            return self.sqr_occupier
         x, y = subcoords
         xx, yy = int(x*self.size), int(y*self.size)
-        return self.subcells[yy][xx]
-
-    def occupy(self, obj):
-        if not self.crossable: return False
-        if obj.footprint.is_square:
-            if self.occupied != 0: return False
-            self.occupied = 2
-            self.sqr_occupier = obj
-            return True
-        else:
-            return self.sub_occupy(obj)
-
-    def sub_occupy(self, obj):
-        if not self.crossable: return False
-        if self.occupied == 2: return False
-        size = obj.footprint.size / 2 # Radius
-        for x in range(self.size):
-            for y in range(self.size):
-                sx, sy = self.coords.get()
-                coords = Point(sx+(x/self.size), sy+(y/self.size))
-                v = Vector.from_abs(obj.coords, coords)
-                if v.magnitude > size:
-                    continue
-                if self.subcells[y][x] is not None:
-                    return False
-                self.subcells[y][x] = obj
-        self.occupied = 1
-        return True
-
-    def release(self, obj):
-        if obj.footprint.is_square:
-            if self.sqr_occupier is not obj:
-                return
-            self.occupied = 0
-            self.sqr_occupier = None
-        else:
-            return self.sub_release(obj)
-
-    def sub_release(self, obj):
-        size = self.size
-        rad = obj.footprint.size
-        delta = obj.coords - self.coords
-        for x in range(size):
-            for y in range(size):
-                if self.subcells[y][x] == obj:
-                    self.subcells[y][x] = None
-        ncnt = sum(1 for row in self.subcells for e in row if e is None)
-        self.occupied = 2 if self.sqr_occupier != None else (
-            0 if ncnt == pow(size, 2) else 1)
+        return self.board.get_by_id(self.board.get_subcells(self.coords)[yy, xx])
 
 
 
@@ -84,104 +66,413 @@ class Board:
         self.session = session
         self.CORE = session.app.CORE
         self.CLRS = session.app.CLRS
-        self.starts = []
-        self.toplace = []
-        self.load_png(path)
+        self.load_map(path)
         self.finder = Pathfinder(self)
+        self.hpa = Hierarchy(self.clearance, self.CORE.cluster_size)
+        self.flows = {}
+        self.path_cache = PathCache(self.CORE.path_cache_size,
+            self.CORE.path_cache_region)
 
     def request_path(self, fp, orig, dest):
-        orig.to_ints()
-        dest.to_ints()
-        return [Point(*pt) for pt in self.finder.find(fp, orig, dest)]
+        job = self.plan_path(fp, orig, dest)
+        nodes = job.run()
+        self.tell_path_done(job)
+        return nodes
+
+    def plan_path(self, fp, orig, dest):
+        '''Prepares path request. Returns PathJob that only uses board state
+        captured here, so it can be run later or in another thread
+        '''
+        orig = int(orig.x), int(orig.y)
+        dest = int(dest.x), int(dest.y)
+        key = self.clearance.get_key(fp)
+        flow = self.flows.get((key, dest))
+        field = self.clearance.get(fp)
+        # Unreachable dest is moved to the nearest reachable cell at once
+        dest = self.clearance.snap(fp, orig, dest)
+        if dest is None:
+            return PathJob(self, field, orig, orig)
+        cache_key = key, orig, dest
+        nodes = self.path_cache.get(cache_key)
+        if nodes is not None:
+            return PathJob(self, field, orig, dest, nodes=nodes)
+        graph = self.hpa.get(fp).snapshot() \
+            if self.hpa.is_worth(orig, dest) else None
+        return PathJob(self, field, orig, dest, flow, graph,
+            key=cache_key, stamp=self.path_cache.version)
+
+    def tell_path_done(self, job):
+        '''Stores result of finished path job in path cache'''
+        if job.key is not None and job.nodes:
+            self.path_cache.put(job.key, [pt.get() for pt in job.nodes],
+                job.stamp)
+
+    def prepare_flows(self, objs, dest):
+        '''Builds flow fields towards dest shared by objs of the same
+        footprint class. Used by grouped move commands
+        '''
+        dest = Point(int(dest.x), int(dest.y))
+        groups = {}
+        for obj in objs:
+            key = self.clearance.get_key(obj.footprint)
+            groups.setdefault(key, []).append(obj)
+        for key, group in groups.items():
+            if len(group) < 2 or (key, dest.get()) in self.flows:
+                continue
+            field = self.clearance.get(group[0].footprint)
+            target = dest.get()
+            if self.finder.acheck(field, target):
+                target = self.finder._find_nearest_free(field, target)
+            # Units that are not reached within limit fall back to search
+            dist = max(self.finder._get_distance((int(obj.coords.x),
+                int(obj.coords.y)), target) for obj in group)
+            limit = 2*dist + self.CORE.cluster_size
+            if len(self.flows) >= self.CORE.flow_field_count:
+                del self.flows[next(iter(self.flows))]
+            self.flows[(key, dest.get())] = FlowField(field, target, limit)
 
     def get(self, coords):
         try: x, y = coords.get() # Point obj
         except: x, y = coords # Point (tuple)
-        return self.cells[int(y)][int(x)]
+        return Cell(self, Point(int(x), int(y)))
 
     def get_object(self, coords):
         try: x, y = coords.get() # Point obj
         except: x, y = coords # Point (tuple)
-        sx, sy = round((x%1), 3), round((y%1), 3)
         subs = self.CORE.sub_per_cell
-        cell = self.cells[int(y)][int(x)]
-        return cell.get_object((x%1,y%1))
+        xx = int(x)*subs + int((x%1)*subs)
+        yy = int(y)*subs + int((y%1)*subs)
+        return self.get_by_id(self.occupancy.get(yy, xx))
+
+    def get_subcells(self, coords):
+        '''Returns occupancy grid (object IDs) of a single cell'''
+        x, y = coords.get()
+        subs = self.CORE.sub_per_cell
+        return self.occupancy.read(y*subs, (y+1)*subs, x*subs, (x+1)*subs)
+
+    def get_by_id(self, oid):
+        '''Returns object of occupancy grid ID (None for 0)'''
+        return self.objects[oid]
+
+    def get_id(self, obj):
+        '''Returns occupancy grid ID of obj (assigned on first use)'''
+        try: return self.ids[obj]
+        except KeyError: pass
+        if self.free_ids:
+            oid = self.free_ids.pop()
+        else:
+            oid = len(self.objects)
+            if oid > MAX_OBJECT_ID:
+                raise OverflowError('Too many objects on board')
+            self.objects += [None]
+        self.objects[oid] = obj
+        self.ids[obj] = oid
+        return oid
+
+    def tell_removed(self, obj):
+        '''Frees ID of obj removed from session (its fp must be released)'''
+        oid = self.ids.pop(obj, None)
+        if oid is not None:
+            self.objects[oid] = None
+            self.free_ids += [oid]
 
     def apply_fp(self, obj):
         fp = obj.footprint
-        success = True
+        subs = self.CORE.sub_per_cell
+        width, height = self.size
         if fp.is_square:
-            vector = Vector.from_point(obj.coords)
-            for pt in fp.points:
-                pt = pt + vector
-                if not self.get(pt).occupy(obj):
-                    success = False
-            if not success:
-                self.release_fp(obj)
+            x0, y0, x1, y1 = self.get_sqr_window(obj, clip=False)
+            if x0 < 0 or y0 < 0 or x1 > width or y1 > height:
+                return False
+            if not self.crossable[y0:y1, x0:x1].all():
                 return False
+            part = self.occupancy.read(y0*subs, y1*subs, x0*subs, x1*subs)
+            if part.any():
+                return False
+            part[:] = self.get_id(obj)
+            self.occupancy.write(y0*subs, x0*subs, part)
+            self.squares[y0:y1, x0:x1] = True
+            self.tell_cells_changed((x0, y0, x1, y1))
         else:
-            cx, cy = obj.coords.get()
-            radius = fp.size / 2
-            gr = radius / self.CORE.sub_per_cell
-            for y in range(int(cy-gr/2)-1, int(cy+gr/2)+2):
-                if not success: break
-                for x in range(int(cx-gr/2)-1, int(cx+gr/2)+2):
-                    if not self.get((x,y)).occupy(obj):
-                        success = False
-                        break
-            if not success:
-                self.release_fp(obj)
+            sx, sy, mask = self.get_disk(fp, obj.coords)
+            n = mask.shape[0]
+            if sx < 0 or sy < 0 or sx+n > width*subs or sy+n > height*subs:
+                return False
+            x0, y0 = sx//subs, sy//subs
+            x1, y1 = (sx+n-1)//subs + 1, (sy+n-1)//subs + 1
+            if not self.crossable[y0:y1, x0:x1].all():
+                return False
+            part = self.occupancy.read(sy, sy+n, sx, sx+n)
+            if part[mask].any():
                 return False
+            part[mask] = self.get_id(obj)
+            self.occupancy.write(sy, sx, part)
         return True
 
     def release_fp(self, obj):
         fp = obj.footprint
+        oid = self.ids.get(obj)
+        if oid is None:
+            return
+        subs = self.CORE.sub_per_cell
         if fp.is_square:
-            vector = Vector.from_point(obj.coords)
-            for pt in fp.points:
-                pt = pt + vector
-                self.get(pt).release(obj)
+            x0, y0, x1, y1 = self.get_sqr_window(obj)
+            part = self.occupancy.read(y0*subs, y1*subs, x0*subs, x1*subs)
+            owned = part[::subs, ::subs] == oid
+            if not owned.any():
+                return
+            part[part == oid] = 0
+            self.occupancy.write(y0*subs, x0*subs, part)
+            self.squares[y0:y1, x0:x1][owned] = False
+            self.tell_cells_changed((x0, y0, x1, y1))
         else:
-            cx, cy = obj.coords.get()
-            radius = fp.size / 2
-            gr = radius / self.CORE.sub_per_cell
-            for y in range(int(cy-gr/2)-1, int(cy+gr/2)+2):
-                for x in range(int(cx-gr/2)-1, int(cx+gr/2)+2):
-                    self.get((x,y)).release(obj)
+            sx, sy, mask = self.get_disk(fp, obj.coords)
+            n = mask.shape[0]
+            width, height = self.size
+            if sx < 0 or sy < 0 or sx+n > width*subs or sy+n > height*subs:
+                return # Could not have been applied here
+            part = self.occupancy.read(sy, sy+n, sx, sx+n)
+            part[mask & (part == oid)] = 0
+            self.occupancy.write(sy, sx, part)
+
+    def move_fp(self, obj, old, new):
+        '''Moves footprint of obj from old to new coords (Points)
+        Only subcells entered (leading edge) are tested and taken and only
+        subcells left (trailing edge) are freed. Board is not changed if
+        leading edge collides. Caller updates obj.coords on success.
+        Returns True on success
+        '''
+        fp = obj.footprint
+        if fp.is_square: # Not used for moving, whole fp is replaced
+            obj.coords = old
+            self.release_fp(obj)
+            obj.coords = new
+            done = self.apply_fp(obj)
+            obj.coords = old
+            if not done:
+                self.apply_fp(obj) # Restores old state
+            return done
+        oid = self.ids.get(obj)
+        if oid is None:
+            return False # Footprint was not applied
+        subs = self.CORE.sub_per_cell
+        width, height = self.size
+        ox, oy, ophase = self._get_placement(fp, old)
+        nx, ny, nphase = self._get_placement(fp, new)
+        n = fp.get_disks(subs).shape[-1]
+        if nx < 0 or ny < 0 or nx+n > width*subs or ny+n > height*subs:
+            return False
+        x0, y0 = nx//subs, ny//subs
+        x1, y1 = (nx+n-1)//subs + 1, (ny+n-1)//subs + 1
+        if not self.crossable[y0:y1, x0:x1].all():
+            return False
+        (ly, lx), (ty, tx) = fp.get_edges(subs, ophase, nphase, (nx-ox, ny-oy))
+        # Window covering both masks
+        wx, wy = min(ox, nx), min(oy, ny)
+        part = self.occupancy.read(wy, max(oy, ny)+n, wx, max(ox, nx)+n)
+        if part[ly, lx].any():
+            return False
+        owned = part[ty, tx] == oid
+        part[ty[owned], tx[owned]] = 0
+        part[ly, lx] = oid
+        self.occupancy.write(wy, wx, part)
+        return True
+
+    def sweep_fp(self, obj, old, path):
+        '''Moves round footprint of obj from old coords through consecutive
+        positions of path (Points) as far as it fits. Window swept by all
+        positions is read and written once. Caller updates obj.coords.
+        Returns num of positions passed (footprint is left at the last one)
+        '''
+        fp = obj.footprint
+        oid = self.ids.get(obj)
+        if oid is None or not path:
+            return 0
+        subs = self.CORE.sub_per_cell
+        width, height = self.size
+        masks = fp.get_disks(subs)
+        n = masks.shape[-1]
+        places = [self._get_placement(fp, pt) for pt in [old] + path]
+        xs, ys = [p[0] for p in places], [p[1] for p in places]
+        x0, y0 = max(min(xs), 0), max(min(ys), 0)
+        x1, y1 = min(max(xs)+n, width*subs), min(max(ys)+n, height*subs)
+        part = self.occupancy.read(y0, y1, x0, x1)
+        free = (part == 0) | (part == oid)
+        done = 0
+        for sx, sy, phase in places[1:]:
+            if sx < 0 or sy < 0 or sx+n > width*subs or sy+n > height*subs:
+                break
+            if not self.crossable[sy//subs:(sy+n-1)//subs+1,
+                    sx//subs:(sx+n-1)//subs+1].all():
+                break
+            if not free[sy-y0:sy-y0+n, sx-x0:sx-x0+n][masks[phase]].all():
+                break
+            done += 1
+        if done == 0:
+            return 0
+        ox, oy, ophase = places[0]
+        nx, ny, nphase = places[done]
+        window = part[oy-y0:oy-y0+n, ox-x0:ox-x0+n]
+        window[masks[ophase] & (window == oid)] = 0
+        part[ny-y0:ny-y0+n, nx-x0:nx-x0+n][masks[nphase]] = oid
+        self.occupancy.write(y0, x0, part)
+        return done
+
+    def is_window_free(self, obj, window):
+        '''Checks if subcell window (x0, y0, x1, y1) lies on crossable cells
+        and holds no subcells taken by objects other than obj
+        '''
+        x0, y0, x1, y1 = window
+        subs = self.CORE.sub_per_cell
+        width, height = self.size
+        if x0 < 0 or y0 < 0 or x1 > width*subs or y1 > height*subs:
+            return False
+        if not self.crossable[y0//subs:(y1-1)//subs+1,
+                x0//subs:(x1-1)//subs+1].all():
+            return False
+        part = self.occupancy.read(y0, y1, x0, x1)
+        return not ((part != 0) & (part != self.ids.get(obj, 0))).any()
+
+    def get_sqr_window(self, obj, clip=True):
+        '''Returns window (x0, y0, x1, y1) covered by square footprint'''
+        vector = Vector.from_point(obj.coords)
+        xs = [int(pt.x + vector.x) for pt in obj.footprint.points]
+        ys = [int(pt.y + vector.y) for pt in obj.footprint.points]
+        if not clip:
+            return min(xs), min(ys), max(xs)+1, max(ys)+1
+        width, height = self.size
+        return (max(min(xs), 0), max(min(ys), 0),
+            min(max(xs)+1, width), min(max(ys)+1, height))
+
+    def get_disk(self, fp, coords):
+        '''Returns subcell coords (x, y) of mask origin and mask of subcells
+        taken by round footprint placed at coords
+        '''
+        sx, sy, phase = self._get_placement(fp, coords)
+        return sx, sy, fp.get_disks(self.CORE.sub_per_cell)[phase]
+
+    def _get_placement(self, fp, coords):
+        '''Returns subcell coords (x, y) of mask origin and phase (y, x) of
+        round footprint placed at coords
+        '''
+        subs = self.CORE.sub_per_cell
+        reach = ceil(fp.size / 2 * subs)
+        # Center is snapped to the nearest sub-subcell phase
+        qx = int(round(coords.x * subs * PHASES))
+        qy = int(round(coords.y * subs * PHASES))
+        return qx//PHASES - reach, qy//PHASES - reach, \
+            (qy % PHASES, qx % PHASES)
+
+    def get_blocked(self, window):
+        '''Creates bool array (True - impassable) of cells in window'''
+        x0, y0, x1, y1 = window
+        return ~self.crossable[y0:y1, x0:x1] | self.squares[y0:y1, x0:x1]
+
+    def tell_cells_changed(self, window):
+        '''Updates clearance maps, cached paths and routes of units after
+        occupancy change in window
+        '''
+        self.squares_version += 1
+        if self.clearance.update(window, self.get_blocked(window)):
+            self.hpa.tell_changed(window)
+            self.flows = {}
+            # Area in which clearance of any footprint could change
+            x0, y0, x1, y1 = window
+            m = self.clearance.get_reach()
+            area = x0-m, y0-m, x1+m, y1+m
+            self.path_cache.tell_changed(area)
+            self.session.paths.tell_changed(area)
 
     def get_cell_gfx(self, coords):
-        try: x, y = coords.get() # Point obj
-        except: x, y = coords # Point (tuple)
-        return self.cgroups[y][x].variant
+        return self.get(coords).variant
+
+    def load_map(self, filename):
+        '''Loads board and base clearance from compiled map (see
+        CompiledMap). PNG is decoded only if compiled map is missing or
+        outdated, compiled map is then saved
+        '''
+        compiled = CompiledMap(filename, self.get_map_settings())
+        data = compiled.load()
+        if data is None:
+            Log.debug('Compiling map')
+            self.load_png(filename)
+            self.clearance = ClearanceMaps(self.get_blocked((0, 0) + self.size))
+            compiled.save({
+                'size': list(self.size),
+                'starts': [list(pt.get()) for pt in self.starts],
+                'toplace': [list(pt.get()) + [key] for pt, key in self.toplace],
+                'terrain': self.terrain,
+                'variants': self.variants,
+                'cells': self.clearance.cells,
+                'distance': self.clearance.distance,
+            })
+            return
+        self.size = tuple(data['size'])
+        self.starts = [Point(x, y) for x, y in data['starts']]
+        self.toplace = [(Point(x, y), key) for x, y, key in data['toplace']]
+        self.terrain = data['terrain']
+        self.variants = data['variants']
+        self.crossable = self.terrain != self.get_terrain_keys().index('not_crsbl')
+        self._init_occupancy()
+        self.clearance = ClearanceMaps(self.get_blocked((0, 0) + self.size),
+            data['cells'], data['distance'])
+
+    def get_map_settings(self):
+        '''Returns settings that affect compiled map'''
+        defines = [(k, list(v)) for k, v in
+            self.CLRS.board_file_defines.items()]
+        return (defines, self.CORE.variant_count, self.CORE.variant_seed,
+            MAX_CLEARANCE)
+
+    def get_terrain_keys(self):
+        '''Returns keys of terrain classes (values of terrain array)'''
+        return list(self.CLRS.board_file_defines)
 
     def load_png(self, filename):
-        defines = {k:tuple(v) for k,v in self.CLRS.board_file_defines.items()}
-        pillow = Image.open(filename)
+        keys = self.get_terrain_keys()
+        colors = array([self.pack_colors(array(v, dtype=uint32))
+            for v in self.CLRS.board_file_defines.values()], dtype=uint32)
+        pillow = Image.open(filename).convert('RGBA')
         self.size = pillow.size
         width, height = pillow.size
-        pixels = pillow.load()
-        self.cells = [[None for x in range(width)] for y in range(height)]
-        var_count = self.CORE.variant_count
+        pixels = self.pack_colors(asarray(pillow, dtype=uint32))
+        # Classify all pixels at once (index of key in defines)
+        order = argsort(colors)
+        found = searchsorted(colors[order], pixels).clip(0, len(keys)-1)
+        self.terrain = order[found].astype(uint8)
+        invalid = colors[self.terrain] != pixels
+        if invalid.any():
+            y, x = (int(v) for v in argwhere(invalid)[0])
+            color = pillow.getpixel((x, y))
+            Log.info('Invalid color {} in map "{}" at position {}'.format(
+                color, filename.split('/')[-1], (x, y)))
+            raise KeyError('Could not find key of this value: {}'.format(color))
+        start = keys.index('start_pos')
+        self.starts = [Point(int(x), int(y))
+            for y, x in argwhere(self.terrain == start)]
+        placed = [i for i, k in enumerate(keys) if 'norm' in k or 'rich' in k]
+        self.toplace = [(Point(int(x), int(y)), keys[self.terrain[y, x]])
+            for y, x in argwhere(isin(self.terrain, placed))]
+        self.crossable = self.terrain != keys.index('not_crsbl')
+        rng = RandomState(self.CORE.variant_seed)
+        self.variants = rng.randint(0, self.CORE.variant_count,
+            (height, width), dtype=uint8)
+        self._init_occupancy()
+
+    def _init_occupancy(self):
+        width, height = self.size
         sub_per_cell = self.CORE.sub_per_cell
-        for y in range(height):
-            for x in range(width):
-                point = Point(x, y)
-                try: key = self.find_key(defines, pixels[x, y])
-                except KeyError:
-                    Log.info('Invalid color {} in map "{}"' + \
-                        ' at position {}'.format( pixels[x, y],
-                        path.split('/')[-1], (x,y)))
-                    raise
-                if key == 'start_pos': self.starts += [point]
-                elif 'norm' in key or 'rich' in key:
-                    self.toplace+=[(point, key)]
-                crossable = key != 'not_crsbl'
-                cell = Cell(point, crossable, sub_per_cell, var_count)
-                self.cells[y][x] = cell
+        self.squares = zeros((height, width), dtype=bool) # Square fp taken
+        self.squares_version = 0 # Incremented when squares change
+        self.occupancy = ChunkedGrid((height*sub_per_cell, width*sub_per_cell),
+            self.CORE.chunk_size*sub_per_cell, uint16,
+            self.CORE.chunk_memory*2**20) # IDs of objects (0 - free)
+        self.objects = [None] # ID -> object
+        self.ids = {} # object -> ID
+        self.free_ids = []
 
     @staticmethod
-    def find_key(dict, value):
-        for k, v in dict.items():
-            if v == value:
-                return k
-        raise KeyError('Could not find key of this value: {}'.format(value))
+    def pack_colors(values):
+        '''Packs RGBA values (last axis) of uint32 array into single ints'''
+        return values[..., 0] << 24 | values[..., 1] << 16 | \
+            values[..., 2] << 8 | values[..., 3]
@@ -0,0 +1,106 @@
+import zlib
+from collections import OrderedDict
+from numpy import zeros, frombuffer
+
+class ChunkedGrid:
+    '''2D grid split into square chunks, allocated on first write
+    Reading a chunk that was never written gives zeros. When memory of
+    loaded chunks exceeds the cap, least recently used ones are unloaded:
+    empty chunks are dropped, others are compressed and decompressed on
+    the next access.
+    Only occupancy grid of board is chunked. Clearance maps and their
+    component labels (see ClearanceMaps) are full-map arrays.
+    shape [2-int tuple] Height and width of grid
+    chunk [int] Side of chunk
+    dtype [numpy dtype] Type of values
+    cap [int] Max memory of loaded chunks [B]
+    '''
+    def __init__(self, shape, chunk, dtype, cap):
+        self.shape = shape
+        self.chunk = chunk
+        self.dtype = dtype
+        self.cap = cap
+        self.chunk_bytes = chunk * chunk * zeros(1, dtype=dtype).itemsize
+        self.chunks = OrderedDict() # (i, j) -> array
+        self.packed = {} # (i, j) -> compressed bytes
+
+    def get(self, y, x):
+        '''Returns single value'''
+        c = self.chunk
+        chunk = self._get_chunk((x//c, y//c), False)
+        return 0 if chunk is None else chunk[y%c, x%c]
+
+    def read(self, y0, y1, x0, x1):
+        '''Returns copy of window of grid. Result can be modified, changes
+        are only kept after it is passed to write
+        '''
+        c = self.chunk
+        if y0//c == (y1-1)//c and x0//c == (x1-1)//c:
+            chunk = self._get_chunk((x0//c, y0//c), False)
+            if chunk is None:
+                return zeros((y1-y0, x1-x0), dtype=self.dtype)
+            return chunk[y0%c:y0%c+y1-y0, x0%c:x0%c+x1-x0].copy()
+        result = zeros((y1-y0, x1-x0), dtype=self.dtype)
+        for (i, j), (ys, xs), (cys, cxs) in self._split(y0, y1, x0, x1):
+            chunk = self._get_chunk((i, j), False)
+            if chunk is not None:
+                result[ys, xs] = chunk[cys, cxs]
+        return result
+
+    def write(self, y0, x0, values):
+        '''Writes window of values with top left corner at (x0, y0)'''
+        h, w = values.shape
+        for key, (ys, xs), (cys, cxs) in self._split(y0, y0+h, x0, x0+w):
+            part = values[ys, xs]
+            chunk = self._get_chunk(key, False)
+            if chunk is None:
+                if not part.any():
+                    continue
+                chunk = self._get_chunk(key, True)
+            chunk[cys, cxs] = part
+
+    def get_memory(self):
+        '''Returns memory used by loaded and compressed chunks [B]'''
+        return len(self.chunks) * self.chunk_bytes + \
+            sum(len(data) for data in self.packed.values())
+
+    def _split(self, y0, y1, x0, x1):
+        '''Yields chunk keys and slices (of window and of chunk) of parts
+        of window lying in single chunks
+        '''
+        c = self.chunk
+        for j in range(y0//c, (y1-1)//c + 1):
+            cy0, cy1 = max(y0, j*c), min(y1, (j+1)*c)
+            for i in range(x0//c, (x1-1)//c + 1):
+                cx0, cx1 = max(x0, i*c), min(x1, (i+1)*c)
+                yield (i, j), \
+                    (slice(cy0-y0, cy1-y0), slice(cx0-x0, cx1-x0)), \
+                    (slice(cy0-j*c, cy1-j*c), slice(cx0-i*c, cx1-i*c))
+
+    def _get_chunk(self, key, create):
+        '''Returns loaded chunk (None if it is empty and create is False)'''
+        try:
+            self.chunks.move_to_end(key)
+            return self.chunks[key]
+        except KeyError: pass
+        if key in self.packed:
+            data = zlib.decompress(self.packed.pop(key))
+            chunk = frombuffer(data, dtype=self.dtype)
+            chunk = chunk.reshape(self.chunk, self.chunk).copy()
+        elif create:
+            chunk = zeros((self.chunk, self.chunk), dtype=self.dtype)
+        else:
+            return None
+        self.chunks[key] = chunk
+        self._evict()
+        return chunk
+
+    def _evict(self):
+        '''Unloads least recently used chunks while memory cap is exceeded
+        (the most recent one always stays)
+        '''
+        while len(self.chunks) > 1 and \
+                len(self.chunks) * self.chunk_bytes > self.cap:
+            key, chunk = self.chunks.popitem(last=False)
+            if chunk.any():
+                self.packed[key] = zlib.compress(chunk.tobytes(), 1)
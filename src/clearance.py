@@ -0,0 +1,247 @@
+from math import ceil
+from scipy.ndimage import label, distance_transform_edt
+from numpy import array, array_equal, ones, zeros, minimum, full, arange, \
+    concatenate, stack, unique, float32, int32, int64
+
+MAX_CLEARANCE = 8 # Distances above this value are not tracked [cells]
+LABEL_TILE = 32 # Side of tile labeled separately [cells]
+NEAREST_REACH = 16 # Initial reach of nearest-cell search [cells]
+
+class ClearanceMaps:
+    '''Cache of board clearance maps.
+    Base field holds True for cells blocked by terrain or square footprints.
+    Single distance map holds clearance of every cell corner (points units
+    stand at), that is the smallest Euclidean distance from the cells around
+    the corner to a blocked cell. Board edges count as blocked.
+    Clearance map of a round footprint is the distance map compared with its
+    threshold, so footprints of any size share one distance transform.
+    Distance map is recomputed only in windows around changed cells.
+    Cached maps are never modified in place (updates replace them with
+    modified copies), so references to them can be used as snapshots.
+    Maps also have connected components labeled (lazily, see Components)
+    to answer reachability queries without searching.
+    cells, distance [float32 array](None) Precomputed transforms of blocked
+        (see attributes of the same names), copied if given
+    '''
+    def __init__(self, blocked, cells=None, distance=None):
+        h, w = blocked.shape
+        self.padded = ones((h+2, w+2), dtype=bool) # Edges are blocked
+        self.padded[1:-1, 1:-1] = blocked
+        self.blocked = self.padded[1:-1, 1:-1]
+        if cells is None or distance is None:
+            cells = self._transform(self.padded)
+            distance = self._corners(cells)[:-1, :-1]
+        self.cells = array(cells, dtype=float32)
+        self.distance = array(distance, dtype=float32)
+        self.maps = {}
+        self.components = {}
+
+    def get(self, fp):
+        '''Returns clearance map (True - blocked) of footprint'''
+        key = self.get_key(fp)
+        try: return self.maps[key]
+        except KeyError: pass
+        self.maps[key] = self.distance <= key
+        return self.maps[key]
+
+    def update(self, window, blocked):
+        '''Replaces base field in window and updates affected areas
+        window [4-int tuple] x0, y0, x1, y1 (x1 and y1 excluded)
+        blocked [bool array] New values of base field in window
+        '''
+        x0, y0, x1, y1 = window
+        if array_equal(self.blocked[y0:y1, x0:x1], blocked):
+            return False
+        self.blocked[y0:y1, x0:x1] = blocked
+        h, w = self.cells.shape
+        m = self.get_reach()
+        # Area where distances may change (in padded coords)
+        ax0, ay0 = max(x0+1-m, 0), max(y0+1-m, 0)
+        ax1, ay1 = min(x1+1+m, w), min(y1+1+m, h)
+        # Area that distances depend on
+        sx0, sy0 = max(ax0-m, 0), max(ay0-m, 0)
+        sx1, sy1 = min(ax1+m, w), min(ay1+m, h)
+        part = self._transform(self.padded[sy0:sy1, sx0:sx1])
+        self.cells[ay0:ay1, ax0:ax1] = part[ay0-sy0:ay1-sy0, ax0-sx0:ax1-sx0]
+        # Corner (x, y) depends on padded cells (x..x+1, y..y+1)
+        bh, bw = self.distance.shape
+        cx0, cy0 = max(ax0-1, 0), max(ay0-1, 0)
+        cx1, cy1 = min(ax1, bw), min(ay1, bh)
+        self.distance[cy0:cy1, cx0:cx1] = \
+            self._corners(self.cells[cy0:cy1+1, cx0:cx1+1])
+        for key, field in self.maps.items():
+            field = field.copy()
+            field[cy0:cy1, cx0:cx1] = self.distance[cy0:cy1, cx0:cx1] <= key
+            self.maps[key] = field
+            if key in self.components:
+                self.components[key].update(field, (cx0, cy0, cx1, cy1))
+        return True
+
+    @staticmethod
+    def get_key(fp):
+        '''Returns clearance threshold of round footprint
+        Corner with clearance not above the threshold is blocked
+        Raises ValueError if footprint is too large for tracked distances
+        '''
+        key = fp.size/2 + 0.5
+        if key >= MAX_CLEARANCE: # Every corner would be blocked
+            raise ValueError('Footprint of size {} needs MAX_CLEARANCE above '
+                '{}'.format(fp.size, key))
+        return key
+
+    @staticmethod
+    def get_reach():
+        '''Returns how far (in cells) changes of base field can spread'''
+        return ceil(MAX_CLEARANCE) + 1
+
+    @staticmethod
+    def _transform(padded):
+        '''Returns capped distance from each cell to the nearest blocked one'''
+        if not padded.any():
+            return full(padded.shape, MAX_CLEARANCE, dtype=float32)
+        result = distance_transform_edt(~padded).astype(float32)
+        return minimum(result, MAX_CLEARANCE)
+
+    @staticmethod
+    def _corners(cells):
+        '''Returns the smallest distance among the 4 cells around corners'''
+        return minimum(minimum(cells[:-1, :-1], cells[:-1, 1:]),
+            minimum(cells[1:, :-1], cells[1:, 1:]))
+
+    def get_components(self, fp):
+        '''Returns connected components of footprint's clearance map'''
+        key = self.get_key(fp)
+        try: return self.components[key]
+        except KeyError: pass
+        self.components[key] = Components(self.get(fp), LABEL_TILE)
+        return self.components[key]
+
+    def snap(self, fp, orig, dest):
+        '''Returns dest or the nearest cell reachable from orig if dest is not
+        Blocked orig is treated as part of the nearest component
+        Returns None if there is no free cell at all
+        '''
+        comps = self.get_components(fp)
+        value = comps.get(orig)
+        if value == 0:
+            nearest = comps.find_nearest(orig, lambda ids: ids != 0)
+            if nearest is None:
+                return None
+            value = comps.get(nearest)
+        if comps.get(dest) == value:
+            return dest
+        return comps.find_nearest(dest, lambda ids: ids == value)
+
+
+
+class Components:
+    '''Connected components of clearance map (free cells)
+    Map is split into tiles labeled separately, labels are joined across
+    tile borders. After change only tiles in changed window are labeled
+    again (at the next query), joining only compares cells along tile
+    borders.
+    Cells are connected along cardinal directions, which matches moves
+    allowed by pathfinding (diagonals do not cut corners)
+    field [bool array] Clearance map (True - blocked)
+    tile [int] Side of tile
+    '''
+    def __init__(self, field, tile):
+        self.field = field
+        self.tile = tile
+        h, w = field.shape
+        self.labels = zeros((h, w), dtype=int32) # Unique across tiles
+        self.dirty = [(0, 0, w, h)] # Windows to label again
+
+    def update(self, field, window):
+        '''Replaces field changed in window (x0, y0, x1, y1)'''
+        self.field = field
+        self.dirty += [window]
+
+    def get(self, coords):
+        '''Returns component ID of cell (0 - blocked)'''
+        self._refresh()
+        x, y = coords
+        return int(self.roots[self.labels[y, x]])
+
+    def get_window(self, window):
+        '''Returns component IDs of cells in window (x0, y0, x1, y1)'''
+        self._refresh()
+        x0, y0, x1, y1 = window
+        return self.roots[self.labels[y0:y1, x0:x1]]
+
+    def find_nearest(self, coords, match):
+        '''Returns the nearest cell (to coords) with component ID accepted by
+        match (function of IDs array, returns bool array) or None
+        Searched window grows until it holds a cell closer than its edges
+        '''
+        x, y = coords
+        h, w = self.labels.shape
+        reach = NEAREST_REACH
+        while True:
+            x0, y0 = max(x-reach, 0), max(y-reach, 0)
+            x1, y1 = min(x+reach+1, w), min(y+reach+1, h)
+            whole = (x0, y0, x1, y1) == (0, 0, w, h)
+            found = match(self.get_window((x0, y0, x1, y1)))
+            if found.any():
+                dist, (ys, xs) = distance_transform_edt(~found,
+                    return_indices=True)
+                lx, ly = x-x0, y-y0
+                # Cells outside window are further than reach
+                if whole or dist[ly, lx] <= reach:
+                    return int(xs[ly, lx])+x0, int(ys[ly, lx])+y0
+            if whole:
+                return None
+            reach *= 2
+
+    def _refresh(self):
+        if not self.dirty:
+            return
+        for window in self.dirty:
+            self._label(window)
+        self.dirty = []
+        self._join()
+
+    def _label(self, window):
+        '''Labels tiles overlapping window'''
+        t = self.tile
+        x0, y0, x1, y1 = window
+        h, w = self.labels.shape
+        tiles_x = (w-1)//t + 1
+        for j in range(y0//t, (y1-1)//t + 1):
+            for i in range(x0//t, (x1-1)//t + 1):
+                ys, xs = slice(j*t, (j+1)*t), slice(i*t, (i+1)*t)
+                part = label(~self.field[ys, xs])[0].astype(int32)
+                # Labels of tile start after the largest possible one of
+                # preceding tiles
+                offset = (j*tiles_x + i) * t*t
+                part[part != 0] += offset
+                self.labels[ys, xs] = part
+
+    def _join(self):
+        '''Finds component IDs of labels, connected across tile borders
+        ID of component is its smallest label
+        '''
+        t = self.tile
+        lab = self.labels
+        h, w = lab.shape
+        pairs = [stack((lab[:, x-1], lab[:, x])) for x in range(t, w, t)]
+        pairs += [stack((lab[y-1], lab[y])) for y in range(t, h, t)]
+        roots = arange(((h-1)//t + 1) * ((w-1)//t + 1) * t*t + 1,
+            dtype=int32)
+        if pairs:
+            pairs = concatenate(pairs, axis=1).astype(int64)
+            pairs = pairs[:, (pairs != 0).all(axis=0)]
+            keys = unique(pairs[0] * len(roots) + pairs[1])
+            pairs = stack((keys // len(roots), keys % len(roots)))
+            parent = {}
+            def find(a):
+                while parent.get(a, a) != a:
+                    a = parent[a]
+                return a
+            for a, b in pairs.T.tolist():
+                ra, rb = find(a), find(b)
+                if ra != rb:
+                    parent[max(ra, rb)] = min(ra, rb)
+            for a in parent:
+                roots[a] = find(a)
+        self.roots = roots
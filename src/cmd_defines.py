@@ -19,6 +19,7 @@ class AllCommands:
             else:
                 if not actor.current.is_placeholder:
                     torefund = actor.current.command.cost
+                    session.timers.discard(actor)
                     actor.current = StartedCommand.placeholder()
                     actor.busy = False
             if torefund is not None:
@@ -38,17 +39,21 @@ class AllCommands:
         def _move_end(scmd):
             actor = scmd.actor
             return True if actor.coords == actor.dest else False
+        def _move_group(session, actors, coords):
+            session.board.prepare_flows(actors, Point(*coords))
         self.move = Command('move', _move_inst, None,
             grouped=True, queueable=False, end=_move_end,
-            takes_pt=True, cost=(0,0,0))
+            takes_pt=True, cost=(0,0,0), group=_move_group)
 
         ################################
         # UNIT: Stop movement
         def _stop_inst(session, actor):
+            session.paths.cancel(actor)
             actor.dest = actor.coords.copy()
             actor.node = Point(-1, -1)
             actor.nodes = []
             actor.direction = Point(0, 0)
+            actor.steps = 0
         self.stop = Command('stop', _stop_inst, None,
             grouped=True, queueable=False, duration=0)
 
@@ -1,10 +1,14 @@
+from heapq import heappush, heappop
+from itertools import count
+
 import logging
 Log = logging.getLogger('MainLogger')
 
 class Command:
     def __init__(self, name, instant=None, delayed=None, grouped=None, queueable=None,
             cost=(0,0,0), duration=None, end=None, post=None, takes_pt=False,
-            takes_obj=False, instant_reqs=[], delayed_reqs=[], get_perc=None):
+            takes_obj=False, instant_reqs=[], delayed_reqs=[], get_perc=None,
+            group=None):
         '''Command Class
         Parameters:
             instant     [func](None) Function executed instantly.
@@ -38,6 +42,9 @@ class Command:
                 Checked instantly.
             get_perc    [func](None) Function that returns completion percentage
                 (delay phase). Receives StartedCommand instance.
+            group       [func](None) Function executed once for all actors
+                when grouped command is started, before their instant funcs.
+                Params taken: session, actors [point] [object]
         '''
         if grouped is None:
             grouped = True if cost == (0,0,0) else False
@@ -66,11 +73,14 @@ class Command:
         self.delayed_reqs = delayed_reqs
         self.get_perc = get_perc
         self.can_perc = get_perc is not None
+        self.group = group
 
     def start(self, session, objlist, *args, forced_queue=False):
         '''objlist [Controllable list] Objects which execute command'''
         if not self.grouped:
             objlist = [objlist[0]] # TODO: Object that can exe command earliest
+        elif self.group is not None:
+            self.group(session, objlist, *args)
         if self.queueable or forced_queue:
             for actor in objlist:
                 actor.queue_cmd(self, args) # NOTE: No args unpacking
@@ -98,6 +108,7 @@ class Command:
                 return False
         if self.instant is not None:
             self.instant(session, actor, *args)
+        session.tell_active(actor)
         return True
 
     def do_delayed(self, session, actor, *args):
@@ -115,13 +126,28 @@ class StartedCommand:
         self.command = command
         self.args = args
         self.start_tick = self.session.tick
+        self.is_timed = command.duration is not None
 
     @classmethod
     def placeholder(cls):
         obj = cls.__new__(cls)
         obj.is_placeholder = True
+        obj.is_timed = False
         return obj
 
+    def get_end_tick(self):
+        '''Returns tick at which timed command is done'''
+        return self.start_tick + self.command.duration
+
+    def get_perc(self):
+        '''Returns completion percentage or None if it is unknown'''
+        if self.command.can_perc:
+            return self.command.get_perc(self)
+        if self.is_timed and self.command.duration > 0:
+            done = self.session.tick - self.start_tick
+            return min(100 * done // self.command.duration, 100)
+        return None
+
     def check_done(self):
         if self.command.duration != None:
             return self.session.tick >= self.command.duration + self.start_tick
@@ -133,3 +159,33 @@ class StartedCommand:
 
     def do_delayed(self):
         return self.command.do_delayed(self.session, self.actor, *self.args)
+
+
+
+class CommandTimers:
+    '''Heap of started timed commands (with duration) ordered by end tick
+    Timed commands are not polled, session fires them when they are done.
+    Each actor has at most one timed command running.
+    '''
+    def __init__(self):
+        self.heap = []
+        self.counter = count()
+        self.running = {} # actor -> started command
+
+    def add(self, scmd):
+        self.running[scmd.actor] = scmd
+        heappush(self.heap, (scmd.get_end_tick(), next(self.counter), scmd))
+
+    def discard(self, actor):
+        '''Drops timed command of actor (if there is one)'''
+        self.running.pop(actor, None)
+
+    def pop_due(self, tick):
+        '''Returns started commands done at tick (in order they end)'''
+        result = []
+        while self.heap and self.heap[0][0] <= tick:
+            scmd = heappop(self.heap)[2]
+            if self.running.get(scmd.actor) is scmd:
+                del self.running[scmd.actor]
+                result += [scmd]
+        return result
@@ -1,35 +1,52 @@
 import pygame as pg
-from datetime import datetime
+from time import perf_counter_ns, sleep
 from src.handlers import Handlers
 from src.interface import Interface
 from src.system import to_ns
+from src.simworker import SimulationWorker
 
 import logging
 Log = logging.getLogger('MainLogger')
 
+MIN_FRAME_WAIT = 10**6 # [ns] Lets simulation thread run when fps is not capped
+
 class Application(Handlers, Interface):
     def __init__(self, launcher):
         Log.info('Starting game')
         self.leaving = False
         self.back_to_launcher = False
         self.extract_lnch(launcher)
-        self.timer_init()
         self.session.reinit(self)
+        self.sim = SimulationWorker(self.session, self.player,
+            self.GAME.ticks_per_sec, self.CORE.max_catchup_ticks)
+        self.view = self.sim.snapshot
+        self.timer_init()
         self.ui_init()
         self.handlers_init()
         self.begin()
 
     def loop(self):
-        if self.timer_update():
-            self.session.update()
-            if self.timer_changed_sec():
-                self.timer_info()
-                self.timer_reset()
+        '''Handles events and draws the latest snapshot of session
+        Session is updated by simulation thread (see SimulationWorker)
+        '''
+        if self.sim.error is not None:
+            Log.error('Simulation failed, leaving game')
+            self.leaving = True
+            return
+        if self.timer_changed_sec():
+            self.timer_info()
+            self.timer_reset()
         for evt in pg.event.get():
             self.evt_handle(evt)
-        pg.display.update()
-        if not self.session.is_paused:
-            self.blit_full()
+        if self.timer_frame_due():
+            self.view = self.sim.snapshot
+            self.prune_selection()
+            self.sim.viewport = self.get_viewport()
+            self.sim.selection = tuple(self.selection)
+            pg.display.update()
+            if not self.session.is_paused:
+                self.blit_full()
+        self.timer_wait()
 
     def extract_lnch(self, launcher):
         '''Extract variables from launcher that will be used in game'''
@@ -45,6 +62,7 @@ class Application(Handlers, Interface):
 
     def begin(self):
         self.session.begin()
+        self.sim.start()
 
     def tell_defeated(self):
         Log.debug('Defeated!')
@@ -55,48 +73,61 @@ class Application(Handlers, Interface):
         self.leaving = True
 
     def cleanup(self):
+        self.sim.stop()
+        self.session.cleanup()
         pg.display.quit()
 
     # Timer methods
 
     def timer_init(self):
+        '''Render timer. Frames are drawn at most every frame_len, ticks
+        are counted by clock of simulation thread
+        '''
         t = to_ns({})
-        t.ticks = 0
         t.frames = 0
         t.ticks_per_sec = self.GAME.ticks_per_sec
-        t.tick_len = 1e6/(t.ticks_per_sec) # [us]
-        t.prev_sec, t.prev_usec = 0, 0
-        t.sec, t.usec = 0, 0
-        t.us_elapsed = 0
+        t.frame_len = 10**9 // self.USER.max_fps if self.USER.max_fps else 0
+        now = perf_counter_ns()
+        t.next_frame = now
+        t.sec_start = now
+        t.prev_ticks = self.sim.clock.steps
+        t.prev_dropped = self.sim.clock.dropped
         self.timer = t
 
-    def timer_update(self):
+    def timer_frame_due(self):
+        '''Checks if next frame can be rendered (render cap)'''
         t = self.timer
-        now = datetime.now()
-        t.sec, t.usec = now.second, now.microsecond
+        now = perf_counter_ns()
+        if now < t.next_frame:
+            return False
+        t.next_frame = max(t.next_frame + t.frame_len, now)
         t.frames += 1
-        delta_usec = (t.usec - t.prev_usec)%1e6
-        t.prev_usec = t.usec
-        t.us_elapsed += delta_usec
-        if t.us_elapsed >= t.tick_len:
-            t.us_elapsed -= t.tick_len
-            t.ticks += 1
-            return True
-        return False
+        return True
+
+    def timer_wait(self):
+        '''Sleeps until next frame is due (at least MIN_FRAME_WAIT)'''
+        delay = self.timer.next_frame - perf_counter_ns()
+        sleep(max(delay, MIN_FRAME_WAIT) / 1e9)
 
     def timer_changed_sec(self):
         t = self.timer
-        return t.prev_sec != t.sec
+        return perf_counter_ns() - t.sec_start >= 10**9
 
     def timer_reset(self):
         t = self.timer
-        t.ticks = 0
         t.frames = 0
-        t.prev_sec = t.sec
+        t.sec_start = perf_counter_ns()
+        t.prev_ticks = self.sim.clock.steps
+        t.prev_dropped = self.sim.clock.dropped
 
     def timer_info(self):
         t = self.timer
-        ticks = t.ticks - t.ticks_per_sec
+        seconds = (perf_counter_ns() - t.sec_start) / 1e9
+        done = self.sim.clock.steps - t.prev_ticks
+        dropped = self.sim.clock.dropped - t.prev_dropped
+        ticks = done - round(t.ticks_per_sec * seconds)
         relative = ('{} behind'.format(abs(ticks)) if ticks < 0 \
             else '{} ahead'.format(ticks)) if ticks != 0 else 'OK'
+        if dropped:
+            relative += ', {} dropped'.format(dropped)
         Log.info('FPS: {}   \tTicks: {}'.format(t.frames, relative))
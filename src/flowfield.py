@@ -0,0 +1,29 @@
+from scipy.sparse.csgraph import dijkstra
+from src.hpa import make_grid_graph, compress_path
+
+class FlowField:
+    '''Destination-rooted integration field over a clearance map
+    Holds cost of travel to dest and the next cell towards dest for each cell
+    reached within limit. Built once and followed by all units of a group.
+    '''
+    def __init__(self, field, dest, limit):
+        h, w = field.shape
+        self.size = w, h
+        self.dest = dest
+        x, y = dest
+        graph = make_grid_graph(~field)
+        self.costs, self.nexts = dijkstra(graph, directed=False,
+            indices=y*w+x, return_predecessors=True, limit=limit)
+
+    def get_path(self, orig):
+        '''Returns list of nodes (as Pathfinder.find) or None if not reached'''
+        w, h = self.size
+        x, y = orig
+        index = y*w + x
+        if not self.costs[index] < float('inf'):
+            return None
+        cells = []
+        while index >= 0:
+            cells += [(index % w, index // w)]
+            index = int(self.nexts[index])
+        return compress_path(cells)
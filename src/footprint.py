@@ -1,6 +1,11 @@
 from src.geometry import Point
-from numpy import zeros
-from math import sqrt, ceil
+from numpy import arange, zeros, nonzero
+from math import ceil
+
+PHASES = 10 # Positions of round FP center within subcell (along a line)
+_DISKS = {} # Cache of round FP masks
+_EDGES = {} # Cache of round FP mask edges
+EDGE_CACHE_SIZE = 4096
 
 class Footprint:
     '''Footprint class defines area an object occupies on board
@@ -29,13 +34,45 @@ class Footprint:
         obj.is_square = False
         return obj
 
-    def get_morph_kernel(self):
-        size = ceil(self.size)
-        a = zeros((size, size))
-        center = self.size//2
-        for x in range(size):
-            for y in range(size):
-                delta = sqrt(abs(x-center)**2 + abs(y-center)**2)
-                if delta <= ceil(self.size/2):
-                    a[y, x] = 1
-        return a
+    def get_disks(self, sub_per_cell):
+        '''Returns masks of subcells taken by round FP (computed once per
+        size). Array of shape (PHASES, PHASES, n, n), indexed by sub-subcell
+        phase of center along y and x. Mask origin lies ceil(radius) subcells
+        up and left from the subcell holding the center.
+        Subcell is taken if its corner is within radius from the center.
+        '''
+        key = self.size, sub_per_cell
+        try: return _DISKS[key]
+        except KeyError: pass
+        radius = self.size / 2 * sub_per_cell # [subcells]
+        reach = ceil(radius)
+        offsets = arange(-reach, reach+2)
+        phases = arange(PHASES) / PHASES
+        # Axes: phase y, phase x, subcell y, subcell x
+        dy = offsets[None, None, :, None] - phases[:, None, None, None]
+        dx = offsets[None, None, None, :] - phases[None, :, None, None]
+        _DISKS[key] = dy**2 + dx**2 <= radius**2
+        return _DISKS[key]
+
+    def get_edges(self, sub_per_cell, old, new, delta):
+        '''Returns subcells entered (leading edge) and left (trailing edge)
+        by round FP moving between two mask placements, as index arrays
+        (ys, xs) relative to window covering both masks
+        old, new [2-int tuple] Phases (y, x) of the center
+        delta [2-int tuple] Shift (x, y) of mask origin in subcells
+        '''
+        key = self.size, sub_per_cell, old, new, delta
+        try: return _EDGES[key]
+        except KeyError: pass
+        masks = self.get_disks(sub_per_cell)
+        n = masks.shape[-1]
+        dx, dy = delta
+        wx, wy = min(dx, 0), min(dy, 0) # Window origin
+        shape = n + abs(dy), n + abs(dx)
+        before, after = zeros(shape, dtype=bool), zeros(shape, dtype=bool)
+        before[-wy:n-wy, -wx:n-wx] = masks[old]
+        after[dy-wy:dy-wy+n, dx-wx:dx-wx+n] = masks[new]
+        if len(_EDGES) >= EDGE_CACHE_SIZE:
+            del _EDGES[next(iter(_EDGES))]
+        _EDGES[key] = nonzero(after & ~before), nonzero(before & ~after)
+        return _EDGES[key]
@@ -1,3 +1,4 @@
+from math import hypot
 from src.command import StartedCommand
 
 class Object:
@@ -11,13 +12,16 @@ class Object:
         self.session = sess
         self.coords = coords
         self.footprint = ftprint
-        self.selected = False
         self.tick = 0
 
     def update(self, tick):
-        '''Keeps track of session's tick'''
+        '''Keeps track of session's tick (last tick obj was updated at)'''
         self.tick = tick
 
+    def is_idle(self):
+        '''Checks if obj has nothing to do, idle objs are not updated'''
+        return True
+
     def get_attrs(self):
         '''Creates dict with data to put in console'''
         return {}
@@ -28,12 +32,6 @@ class Object:
         '''
         return '<{}'.format(str(self)[-11:])
 
-    def select(self):
-        self.selected = True
-
-    def deselect(self):
-        self.selected = False
-
 
 
 class Controllable(Object):
@@ -57,7 +55,6 @@ class Controllable(Object):
         self.commands = {}
         self.busy = False
         self.current = StartedCommand.placeholder()
-        self.cmd_perc = None
         self.add_cmd('cancel', self.session.cmds.cancel, (0,0))
 
     def add_cmd(self, key, command, position):
@@ -72,21 +69,19 @@ class Controllable(Object):
 
     def queue_cmd(self, command, args):
         self.queue += [(command, args)]
+        self.session.tell_active(self)
 
     def update(self, tick):
-        '''Updates obj state'''
+        '''Updates obj state
+        Timed commands are not checked here, session tells when they are done
+        '''
         super().update(tick)
         self.weapon.update()
-        if self.busy and not self.current.is_placeholder:
+        self.fire()
+        if self.busy and not self.current.is_placeholder and \
+                not self.current.is_timed:
             if self.current.check_done():
-                self.current.do_delayed()
-                self.busy = False
-                self.cmd_perc = None
-                if self.queue == []:
-                    self.current = StartedCommand.placeholder()
-            else:
-                if self.current.command.can_perc:
-                    self.cmd_perc = self.current.command.get_perc()
+                self.tell_cmd_done(self.current)
         if self.queue != [] and not self.busy:
             self.busy = True
             command, args = self.queue[0]
@@ -94,8 +89,35 @@ class Controllable(Object):
             if not self.current.do_instant():
                 self.current = StartedCommand.placeholder()
                 self.busy = False
+            elif self.current.is_timed:
+                self.session.timers.add(self.current)
             self.queue = self.queue[1:]
 
+    def tell_cmd_done(self, scmd):
+        '''Finishes current command (scmd)'''
+        scmd.do_delayed()
+        self.busy = False
+        if self.queue == []:
+            self.current = StartedCommand.placeholder()
+        else:
+            self.session.tell_active(self)
+
+    def get_cmd_perc(self):
+        '''Returns completion percentage of current command (or None)'''
+        if not self.busy or self.current.is_placeholder:
+            return None
+        return self.current.get_perc()
+
+    def is_idle(self):
+        '''Obj running timed command is idle until the command is done'''
+        if self.busy: waiting = not self.current.is_timed
+        else: waiting = self.queue != []
+        weapon = self.weapon
+        if weapon.is_placeholder:
+            return not waiting
+        return not waiting and weapon.cooldown == 0 and weapon.is_ready \
+            and self.find_target() is None
+
     def get_attrs(self):
         '''Creates dict with data to put in console'''
         d = super().get_attrs()
@@ -119,8 +141,37 @@ class Controllable(Object):
         '''Destroys obj'''
         self.session.tell_destroyed(self)
 
+    def fire(self):
+        '''Attacks the nearest enemy in weapon range if weapon is ready'''
+        weapon = self.weapon
+        if weapon.is_placeholder or not weapon.is_ready:
+            return
+        target = self.find_target()
+        if target is None:
+            return
+        weapon.cooldown, weapon.is_ready = weapon.rate, False
+        target.recv_damage(self)
+
     # TODO: Restore other combat-related methods
 
+    def is_enemy(self, obj):
+        '''Checks if obj is owned by another player'''
+        owner = getattr(obj, 'owner', None)
+        return owner is not None and owner is not self.owner
+
     def check_dist(self, obj):
         '''Check distance to other MapObject'''
-        return Vector.from_point(abs(self.coords-obj.coords)).magnitude
+        return hypot(self.coords.x-obj.coords.x, self.coords.y-obj.coords.y)
+
+    def find_in_range(self, radius=None):
+        '''Returns objects within radius (weapon range by default)'''
+        if radius is None: radius = self.weapon.range
+        return [obj for obj in self.session.spatial.query_radius(
+            self.coords, radius) if obj is not self]
+
+    def find_target(self):
+        '''Returns the nearest enemy within weapon range (or None)'''
+        if len(self.session.players) < 2:
+            return None # No enemies
+        enemies = [obj for obj in self.find_in_range() if self.is_enemy(obj)]
+        return min(enemies, key=self.check_dist, default=None)
@@ -31,8 +31,7 @@ class Base:
         self.y = -self.y
 
     def __abs__(self):
-        self.x = abs(self.x)
-        self.y = abs(self.y)
+        return type(self)(abs(self.x), abs(self.y))
 
     def __eq__(self, other):
         if self.x == other.x and self.y == other.y:
@@ -73,9 +73,8 @@ class Handlers:
 
     def evt_cmnd_lclick(self, pos):
         '''LMB click on commands panel'''
-        if self.selection == []:
-            return
-        if self.selection[0].owner is not self.player:
+        selection = self.view.selection
+        if not selection or selection[0].owner is not self.player:
             return
         v = self.ui_vars
         x, y = pos
@@ -84,11 +83,11 @@ class Handlers:
         if x%icowsp >= v.cicos or y%icowsp >= v.cicos:
             return # Spacing, not icon
         x, y = x//icowsp, y//icowsp
-        key, command = self.selection[0].get_cmd((x,y))
+        key, command = selection[0].get_cmd((x,y))
         if key == None:
             return # Empty slot
         #Log.debug('Clicked {}'.format(key))
-        self.act_execute_cmnd(self.selection, command)
+        self.act_execute_cmnd([view.obj for view in selection], command)
 
     def update_board_pos(self):
         v = self.ui_vars
@@ -99,21 +98,16 @@ class Handlers:
 
     def act_select(self, pos):
         v = self.ui_vars
-        board = self.session.board
         shift = pg.key.get_mods() & pg.KMOD_SHIFT
         x, y = pos
-        obj = board.get_object((x,y))
+        obj = self.view.get_object((x,y))
         if obj is not None:
             if shift:
-                if obj.selected:
-                    obj.deselect()
+                if obj in self.selection:
                     self.selection.remove(obj)
                 else:
-                    obj.select()
                     self.selection += [obj]
             else:
-                self.act_deselect_all()
-                obj.select()
                 self.selection = [obj]
         else:
             if not shift: self.act_deselect_all()
@@ -129,7 +123,8 @@ class Handlers:
             self.pointing = True
         else:
             shift = pg.key.get_mods() & pg.KMOD_SHIFT
-            command.start(self.session, scope, forced_queue=shift)
+            self.sim.submit(command.start, self.session, list(scope),
+                forced_queue=shift)
 
     def act_point(self, coords):
         command, scope = self.pointing_for
@@ -141,25 +136,34 @@ class Handlers:
     def act_point_coords(self, coords):
         command, scope = self.pointing_for
         shift = pg.key.get_mods() & pg.KMOD_SHIFT
-        command.start(self.session, scope, coords, forced_queue=shift)
+        self.sim.submit(command.start, self.session, list(scope), coords,
+            forced_queue=shift)
         self.pointing_for = (None, None)
         self.pointing = False
 
     def act_point_object(self, coords):
         command, scope = self.pointing_for
-        obj = self.session.board.get_object(coords)
+        obj = self.view.get_object(coords)
         shift = pg.key.get_mods() & pg.KMOD_SHIFT
-        command.start(self.session, scope, obj, forced_queue=shift)
+        self.sim.submit(command.start, self.session, list(scope), obj,
+            forced_queue=shift)
         self.pointing_for = (None, None)
         self.pointing = False
 
     # Selection-related methods
 
     def act_deselect_all(self):
-        for obj in self.selection:
-            obj.deselect()
         self.selection = []
 
+    def prune_selection(self):
+        '''Drops objects removed from session (selection is kept by UI only,
+        live objects are never changed by it)
+        '''
+        dropped = self.view.dropped
+        if dropped:
+            self.selection = [obj for obj in self.selection \
+                if obj not in dropped]
+
     def sort_selection(self):
         old_len = len(self.selection)
         old_sel = [o for o in self.selection]
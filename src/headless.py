@@ -0,0 +1,111 @@
+import yaml
+from time import perf_counter_ns
+import src.system as internal
+import src.objects as o
+from src.board import Board
+from src.session import Session
+from src.player import Player
+from src.geometry import Point
+
+import logging
+Log = logging.getLogger('MainLogger')
+
+class Headless:
+    '''Runs session without display, in place of Launcher and Application
+    Provides configs and callbacks session expects from its app
+    map_name [str] Name of map in board directory
+    players [int](1) Num of players, each starts at next start position
+    units [int](0) Num of workers added for each player around its base
+    '''
+    def __init__(self, map_name, players=1, units=0):
+        self.load_config()
+        board_path = self.CORE.board_dir + map_name + self.CORE.board_suff
+        self.session = Session(self)
+        self.session.set_board(Board(self.session, board_path))
+        self.players = []
+        for i in range(players):
+            player = Player('Bot{}'.format(i), None)
+            self.players += [player]
+            self.session.add_player(player)
+            self.add_workers(player, units)
+        self.player = self.players[0] if self.players else None
+
+    def load_config(self):
+        '''Loads configuration files needed by session'''
+        for key in ('core', 'clrs', 'game'):
+            with open('cnf/{}.yml'.format(key)) as file:
+                config = internal.to_ns(yaml.safe_load(file))
+            setattr(self, key.upper(), config)
+
+    def add_workers(self, player, count):
+        '''Adds workers around player's base, in rows below it'''
+        home = player.home_cc_pos
+        added, i = 0, 0
+        while added < count and i < 100*count:
+            x = home.x + 3*(i%16 - 8)
+            y = home.y + 6 + 3*(i//16)
+            i += 1
+            if self.session.add_object(o.Worker(self.session, Point(x, y),
+                    player)):
+                added += 1
+        if added < count:
+            Log.info('Added {} of {} workers'.format(added, count))
+
+    def apply(self, entry):
+        '''Starts scripted command
+        entry [dict] Keys: command (name in AllCommands), player (index),
+            actors (objkey of player's objects), coords ([x, y] on board)
+            or offset ([x, y] from player's base)
+        '''
+        player = self.players[entry.get('player', 0)]
+        command = getattr(self.session.cmds, entry['command'])
+        actors = [obj for obj in self.session.objects \
+            if getattr(obj, 'owner', None) is player and \
+            obj.objkey == entry['actors']]
+        if not actors:
+            Log.info('No actors for {}'.format(entry))
+            return
+        args = ()
+        if 'coords' in entry:
+            args = (tuple(entry['coords']),)
+        elif 'offset' in entry:
+            home, (dx, dy) = player.home_cc_pos, entry['offset']
+            args = ((home.x+dx, home.y+dy),)
+        command.start(self.session, actors, *args)
+
+    def run(self, ticks, script=()):
+        '''Steps session as fast as possible, applying script entries at
+        their ticks (before session tick is updated)
+        Returns dict of timing statistics
+        '''
+        pending = sorted(script, key=lambda entry: entry.get('tick', 0))
+        durations = []
+        start = perf_counter_ns()
+        for i in range(ticks):
+            while pending and pending[0].get('tick', 0) <= self.session.tick:
+                self.apply(pending.pop(0))
+            begin = perf_counter_ns()
+            self.session.update()
+            durations += [perf_counter_ns() - begin]
+        elapsed = (perf_counter_ns() - start) / 1e9
+        return {
+            'ticks': ticks,
+            'seconds': elapsed,
+            'ticks_per_sec': ticks / elapsed if elapsed else 0,
+            'mean_tick_ms': sum(durations) / len(durations) / 1e6 \
+                if durations else 0,
+            'max_tick_ms': max(durations) / 1e6 if durations else 0,
+            'objects': len(self.session.objects),
+            'active': len(self.session.active),
+        }
+
+    def cleanup(self):
+        self.session.cleanup()
+
+    # Callbacks of session
+
+    def tell_dirty(self):
+        pass
+
+    def tell_defeated(self):
+        Log.info('Player {} defeated'.format(self.player.username))
@@ -0,0 +1,297 @@
+from heapq import heappush, heappop
+from itertools import count
+from copy import copy
+from numpy import arange, full, concatenate, isinf
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+from src.jps import DIAG_COST, Pathfinder
+
+MIN_SPLIT_ENTRANCE = 6 # Entrances this long get two transitions
+
+def make_grid_graph(free):
+    '''Creates sparse graph of 8-connected free cells (no corner cutting)
+    Node index of cell (x, y) is y*width+x
+    '''
+    h, w = free.shape
+    index = arange(h*w).reshape(h, w)
+    rows, cols, costs = [], [], []
+    for dx, dy in ((1,0), (0,1), (1,1), (-1,1)):
+        ya, yb = slice(0, h-dy), slice(dy, h)
+        xa, xb = slice(max(-dx,0), w-max(dx,0)), slice(max(dx,0), w-max(-dx,0))
+        mask = free[ya, xa] & free[yb, xb]
+        if dx != 0 and dy != 0:
+            mask &= free[ya, xb] & free[yb, xa]
+        rows += [index[ya, xa][mask]]
+        cols += [index[yb, xb][mask]]
+        costs += [full(mask.sum(), DIAG_COST if dx and dy else 1.)]
+    return csr_matrix((concatenate(costs), (concatenate(rows),
+        concatenate(cols))), shape=(h*w, h*w))
+
+def compress_path(cells):
+    '''Leaves only cells at which direction of a cell-by-cell path changes'''
+    result = []
+    for i in range(1, len(cells)):
+        if i == len(cells)-1:
+            result += [cells[i]]
+            break
+        delta = Pathfinder._find_delta(cells[i-1], cells[i])
+        if delta != Pathfinder._find_delta(cells[i], cells[i+1]):
+            result += [cells[i]]
+    return result
+
+
+
+class Cluster:
+    '''Part of the board. Holds transition nodes placed on its borders and
+    costs (and paths) of travel between them that do not leave the cluster
+    '''
+    def __init__(self, window):
+        self.window = window
+        self.nodes = []
+        self.dists = None
+        self.preds = None
+
+    def get_local(self, coords):
+        x0, y0, x1, y1 = self.window
+        x, y = coords
+        return (y-y0)*(x1-x0) + (x-x0)
+
+    def get_global(self, index):
+        x0, y0, x1, y1 = self.window
+        return x0 + index%(x1-x0), y0 + index//(x1-x0)
+
+    def search(self, field, sources):
+        '''Runs Dijkstra within cluster, returns distances and predecessors'''
+        x0, y0, x1, y1 = self.window
+        graph = make_grid_graph(~field[y0:y1, x0:x1])
+        indices = [self.get_local(src) for src in sources]
+        return dijkstra(graph, directed=False, indices=indices,
+            return_predecessors=True)
+
+    def rebuild(self, field, nodes):
+        self.nodes = sorted(nodes)
+        self.dists, self.preds = None, None
+        if self.nodes:
+            self.dists, self.preds = self.search(field, self.nodes)
+
+    def trace(self, preds, row, coords):
+        '''Returns cells from coords back to the root of preds row'''
+        result = []
+        index = self.get_local(coords)
+        while index >= 0:
+            result += [self.get_global(index)]
+            index = int(preds[row, index])
+        return result
+
+
+
+class ClusterGraph:
+    '''Abstract graph over single clearance map (single footprint class)
+    Transitions connect pairs of free cells on both sides of cluster borders
+    Clusters are rebuilt lazily after they are marked as dirty
+    Rebuilt clusters replace old ones, so snapshots stay intact
+    '''
+    def __init__(self, field, cluster_size):
+        self.field = field
+        self.csize = cluster_size
+        h, w = field.shape
+        self.ccount = -(-w//cluster_size), -(-h//cluster_size)
+        self.clusters = {}
+        cw, ch = self.ccount
+        for j in range(ch):
+            for i in range(cw):
+                x0, y0 = i*cluster_size, j*cluster_size
+                window = x0, y0, min(x0+cluster_size, w), min(y0+cluster_size, h)
+                self.clusters[(i, j)] = Cluster(window)
+        self.borders = {}
+        self.dirty = set(self.clusters)
+        self.frozen = False # Set on snapshots, which are never updated
+
+    def tell_changed(self, window):
+        '''Marks clusters overlapping window (x0, y0, x1, y1) as dirty'''
+        x0, y0, x1, y1 = window
+        cw, ch = self.ccount
+        for j in range(max(y0//self.csize, 0), min((y1-1)//self.csize+1, ch)):
+            for i in range(max(x0//self.csize, 0), min((x1-1)//self.csize+1, cw)):
+                self.dirty.add((i, j))
+
+    def get_cluster(self, coords):
+        x, y = coords
+        return self.clusters[(x//self.csize, y//self.csize)]
+
+    def update(self):
+        '''Rebuilds borders and clusters that were affected by changes'''
+        if self.frozen or not self.dirty:
+            return
+        cw, ch = self.ccount
+        affected = set()
+        for i, j in self.dirty:
+            for key in (('v',i-1,j), ('v',i,j), ('h',i,j-1), ('h',i,j)):
+                kind, ki, kj = key
+                if ki < 0 or kj < 0: continue
+                if kind == 'v' and ki+1 >= cw: continue
+                if kind == 'h' and kj+1 >= ch: continue
+                self.borders[key] = self._make_transitions(key)
+                affected |= {(ki, kj), (ki+1, kj) if kind == 'v' else (ki, kj+1)}
+        self.dirty = set()
+        self.partners = {}
+        nodes = {key:set() for key in self.clusters}
+        for pairs in self.borders.values():
+            for a, b in pairs:
+                self.partners.setdefault(a, set()).add(b)
+                self.partners.setdefault(b, set()).add(a)
+                nodes[self._get_key(a)].add(a)
+                nodes[self._get_key(b)].add(b)
+        for key in affected:
+            cluster = Cluster(self.clusters[key].window)
+            cluster.rebuild(self.field, nodes[key])
+            self.clusters[key] = cluster
+
+    def snapshot(self):
+        '''Returns up-to-date frozen copy of graph
+        Snapshot can be searched in another thread
+        '''
+        self.update()
+        obj = copy(self)
+        obj.clusters = dict(self.clusters)
+        obj.borders = dict(self.borders)
+        obj.dirty = set()
+        obj.frozen = True
+        return obj
+
+    def _get_key(self, coords):
+        x, y = coords
+        return x//self.csize, y//self.csize
+
+    def _make_transitions(self, key):
+        '''Finds pairs of cells connecting clusters across border'''
+        kind, i, j = key
+        a = self.clusters[(i, j)].window
+        if kind == 'v': # Border between (i, j) and (i+1, j)
+            x = a[2]
+            cells = [((x-1, y), (x, y)) for y in range(a[1], a[3])]
+        else: # Border between (i, j) and (i, j+1)
+            y = a[3]
+            cells = [((x, y-1), (x, y)) for x in range(a[0], a[2])]
+        result = []
+        run = []
+        for pair in cells + [None]:
+            if pair is not None and not any(self.field[c[1], c[0]] for c in pair):
+                run += [pair]
+                continue
+            if len(run) >= MIN_SPLIT_ENTRANCE:
+                result += [run[0], run[-1]]
+            elif run:
+                result += [run[len(run)//2]]
+            run = []
+        return result
+
+
+
+class Hierarchy:
+    '''Registry of cluster graphs, one per clearance map'''
+    def __init__(self, clearance, cluster_size):
+        self.clearance = clearance
+        self.csize = cluster_size
+        self.graphs = {}
+
+    def get(self, fp):
+        key = self.clearance.get_key(fp)
+        if key not in self.graphs:
+            field = self.clearance.get(fp)
+            self.graphs[key] = ClusterGraph(field, self.csize)
+        return self.graphs[key]
+
+    def is_worth(self, orig, dest):
+        '''Checks if orig and dest are far enough to use abstract graph'''
+        return Pathfinder._get_distance(orig, dest) > 2*self.csize
+
+    def find(self, fp, orig, dest):
+        '''Returns list of nodes (as Pathfinder.find) or None if not found'''
+        return self.search(self.get(fp), orig, dest)
+
+    @staticmethod
+    def search(graph, orig, dest):
+        '''Same as find, but runs on given graph (or its snapshot)'''
+        cells = Hierarchy._find_cells(graph, orig, dest)
+        if cells is None:
+            return None
+        return compress_path(cells)
+
+    @staticmethod
+    def _find_cells(graph, orig, dest):
+        '''Returns cell-by-cell path from orig to dest or None if not found'''
+        graph.update()
+        f = graph.field
+        if f[orig[1], orig[0]] or f[dest[1], dest[0]]:
+            return None
+        oc, dc = graph.get_cluster(orig), graph.get_cluster(dest)
+        odist, opred = oc.search(f, [orig])
+        ddist, dpred = dc.search(f, [dest])
+        # Abstract A*, orig and dest are temporarily inserted into graph
+        starts = {n:odist[0, oc.get_local(n)] for n in oc.nodes}
+        ends = {n:ddist[0, dc.get_local(n)] for n in dc.nodes}
+        heur = lambda n: Pathfinder._get_distance(n, dest)
+        costs, parents, closed = {}, {}, set()
+        queue, counter = [], count()
+        for n, cost in starts.items():
+            if isinf(cost): continue
+            costs[n], parents[n] = cost, 'orig'
+            heappush(queue, (cost + heur(n), next(counter), n))
+        while queue:
+            prio, _, n = heappop(queue)
+            if n in closed: continue
+            if n == 'dest': break
+            closed.add(n)
+            cost = costs[n]
+            cluster = graph.get_cluster(n)
+            row = cluster.nodes.index(n)
+            nbrs = [(m, cluster.dists[row, cluster.get_local(m)]) \
+                for m in cluster.nodes if m != n]
+            nbrs += [(m, 1) for m in graph.partners.get(n, ())]
+            if n in ends:
+                nbrs += [('dest', ends[n])]
+            for m, step in nbrs:
+                if isinf(step) or m in closed: continue
+                if cost + step < costs.get(m, float('inf')):
+                    costs[m], parents[m] = cost + step, n
+                    prio = cost + step + (heur(m) if m != 'dest' else 0)
+                    heappush(queue, (prio, next(counter), m))
+        else:
+            return None
+        chain = ['dest']
+        while chain[-1] != 'orig':
+            chain += [parents[chain[-1]]]
+        chain = chain[::-1]
+        chain[0], chain[-1] = orig, dest
+        return Hierarchy._refine(graph, chain, (oc, opred), (dc, dpred))
+
+    @staticmethod
+    def _refine(graph, chain, origin, target):
+        '''Turns chain of abstract nodes into cell-by-cell path'''
+        oc, opred = origin
+        dc, dpred = target
+        cells = [chain[0]]
+        for k in range(1, len(chain)):
+            prev, n = chain[k-1], chain[k]
+            if k == 1:
+                part = oc.trace(opred, 0, n)[::-1]
+            elif k == len(chain)-1:
+                part = dc.trace(dpred, 0, prev)
+            elif n in graph.partners.get(prev, ()) and \
+                    graph._get_key(prev) != graph._get_key(n):
+                part = [prev, n]
+            else:
+                cluster = graph.get_cluster(n)
+                row = cluster.nodes.index(n)
+                part = cluster.trace(cluster.preds, row, prev)
+            cells += part[1:]
+        return cells
+
+    def tell_changed(self, window):
+        '''Marks clusters near window (x0, y0, x1, y1) as dirty'''
+        x0, y0, x1, y1 = window
+        m = self.clearance.get_reach()
+        for key, graph in self.graphs.items():
+            graph.field = self.clearance.maps[key]
+            graph.tell_changed((x0-m, y0-m, x1+m, y1+m))
@@ -8,6 +8,8 @@ from src.system import to_ns
 import logging
 Log = logging.getLogger('MainLogger')
 
+VIEWPORT_MARGIN = 4 # Cells around view with objects in snapshot
+
 class Interface:
     '''Method-container class. Contains interface-related methods'''
 
@@ -126,24 +128,23 @@ class Interface:
         for y in range(v.bidy):
             for x in range(v.bidx):
                 cell = board.get((x+v.b_sx,y+v.b_sy))
-                texture = self.gfx.terrain['taken'] if cell.occupied == 2 else \
+                taken = self.view.squares[y+v.b_sy, x+v.b_sx]
+                texture = self.gfx.terrain['taken'] if taken else \
                     self.gfx.terrain[cell.variant]
                 xx, yy = x*v.cell_px, y*v.cell_px
                 self.screen.blit(texture, (xx,yy))
 
     def blit_objects(self):
         v = self.ui_vars
-        objects = self.session.objects
-        for obj in objects:
+        for obj in self.view.objects:
             if not self.check_obj_onscreen(obj): continue
-            try: texture = self.gfx.objs[obj.objkey][obj.owner.clr_choice]
-            except AttributeError: texture = self.gfx.objs[obj.objkey]['red']
-            size = obj.footprint.size
+            texture = self.gfx.objs[obj.objkey][obj.color or 'red']
+            size = obj.size
             xmod, ymod = 0, 0
-            if obj.footprint.is_square: size = (size-1)//2
+            if obj.is_square: size = (size-1)//2
             else: xmod, ymod = 0.5*size, 0.5*size
-            x = (obj.coords.x - v.b_sx - size + xmod)*v.cell_px
-            y = (obj.coords.y - v.b_sy - size + ymod)*v.cell_px
+            x = (obj.x - v.b_sx - size + xmod)*v.cell_px
+            y = (obj.y - v.b_sy - size + ymod)*v.cell_px
             self.screen.blit(texture, (x, y))
 
     def blit_resources(self):
@@ -155,16 +156,16 @@ class Interface:
         self.screen.blit(self.gfx.icons['wood'], (ico_left, v.rsr_spc))
         self.screen.blit(self.gfx.icons['iron'], (ico_left, h+v.rsr_spc))
         self.screen.blit(self.gfx.icons['fuel'], (ico_left, 2*h+v.rsr_spc))
-        plr = self.player
-        wood_amount = font.render(str(plr.r_wood), False, self.colors.white)
+        wood, iron, fuel = self.view.resources
+        wood_amount = font.render(str(wood), False, self.colors.white)
         w_rect = wood_amount.get_rect()
         w_rect.right = txt_right
         w_rect.top = v.rsr_spc
-        iron_amount = font.render(str(plr.r_iron), False, self.colors.white)
+        iron_amount = font.render(str(iron), False, self.colors.white)
         i_rect = iron_amount.get_rect()
         i_rect.right = txt_right
         i_rect.top = h + v.rsr_spc
-        fuel_amount = font.render(str(plr.r_fuel), False, self.colors.white)
+        fuel_amount = font.render(str(fuel), False, self.colors.white)
         f_rect = fuel_amount.get_rect()
         f_rect.right = txt_right
         f_rect.top = 2*h + v.rsr_spc
@@ -193,24 +194,27 @@ class Interface:
         of_x, of_y = v.csel_ofx, v.csel_ofy
         cntr_w = v.disp_w - 2*v.cns_ss
         text = ''
+        selection = self.view.selection
         # Selection attrs / list
-        if len(self.selection) == 1:
-            text = self.TEXT.objects[self.selection[0].objkey]
+        if len(selection) == 1:
+            text = self.TEXT.objects[selection[0].objkey]
             if self.debug:
-                text += self.selection[0].get_address()
+                text += selection[0].address
+            if selection[0].progress is not None:
+                text += ' ({}%)'.format(selection[0].progress)
             index = 0
-            for key, value in self.selection[0].get_attrs().items():
+            for key, value in selection[0].attrs.items():
                 icon = self.gfx.icons[key]
                 vtext = font.render(str(value), False, self.colors.white)
                 y = of_y + index*(v.cicos+v.cspc)
                 self.screen.blit(icon, (of_x, y))
                 self.screen.blit(vtext,  (of_x+v.cicos+v.cspc, y))
                 index += 1
-        elif len(self.selection) > 1:
-            text = str(len(self.selection))+self.TEXT.obj_count_suffix
+        elif len(selection) > 1:
+            text = str(len(selection))+self.TEXT.obj_count_suffix
             sect_w = v.csel_cols*(v.cicos+v.csel_spc)-v.csel_spc
             i = 0
-            for obj in self.selection:
+            for obj in selection:
                 texture = self.gfx.grayed[obj.objkey]
                 x = (i% v.csel_cols) * (v.cicos+v.csel_spc)
                 y = (i//v.csel_cols) * (v.cicos+v.csel_spc)
@@ -228,24 +232,18 @@ class Interface:
         self.screen.blit(text, crect)
 
     def blit_cns_cmd_panel(self):
-        if self.selection == []:
-            return
-        try:
-            if self.selection[0].owner is not self.player:
-                return
-        except AttributeError:
+        selection = self.view.selection
+        if not selection or selection[0].owner is not self.player:
             return
         v = self.ui_vars
         of_x, of_y = v.ccmd_ofx, v.ccmd_ofy
         taken_slots = []
-        try: commands = self.selection[0].commands
-        except AttributeError: return
-        for key, cmd in commands.items():
+        for key, cmd in selection[0].commands.items():
             method, position = cmd
             icon = self.gfx.icons[key]
             if position in taken_slots:
                 raise ValueError('Commands position conflict ({}:{})'.format(\
-                    self.selection[0].objkey, key))
+                    selection[0].objkey, key))
             taken_slots += [position]
             px, py = position
             x, y = of_x+px*(v.cicos+v.cspc), of_y+py*(v.cicos+v.cspc)
@@ -254,14 +252,20 @@ class Interface:
     # Helper methods
 
     def check_obj_onscreen(self, obj):
+        '''obj [ObjectView] Object in snapshot'''
         v = self.ui_vars
-        fp = obj.footprint
-        m = fp.size
-        if obj.coords.x+m > v.b_sx and obj.coords.x-m < v.b_sx+v.db_w:
-            if obj.coords.y+m > v.b_sy and obj.coords.y-m < v.b_sy+v.db_h:
+        m = obj.size
+        if obj.x+m > v.b_sx and obj.x-m < v.b_sx+v.db_w:
+            if obj.y+m > v.b_sy and obj.y-m < v.b_sy+v.db_h:
                 return True
         return False
 
+    def get_viewport(self):
+        '''Returns window of board (in cells) objects are published for'''
+        v = self.ui_vars
+        m = VIEWPORT_MARGIN
+        return v.b_sx-m, v.b_sy-m, v.b_sx+v.bidx+m, v.b_sy+v.bidy+m
+
     def make_clr_variants(self, image):
         colors = self.CLRS.player
         toreplace = tuple(self.CLRS.txtr_player_clr)
@@ -1,162 +1,73 @@
-from scipy.ndimage.morphology import binary_dilation as dilate
-from numpy import array
+from numpy import zeros, ones, full, int32, inf, arange, floor, ceil, \
+    minimum, maximum, around, cumsum
+from scipy.ndimage import distance_transform_edt
 from src.queue import Queue
 
-class FoundPath(Exception):
-    '''Raised when dest is found
-    Exception is used to immediatelly leave recursion
-    '''
+DIAG_COST = 1.4 # Cost of diagonal move (cardinal move costs 1)
+ALL_DELTAS = [(0,1), (1,0), (-1,0), (0,-1), (1,1), (1,-1), (-1,1), (-1,-1)]
 
 
 
 class Pathfinder:
-    '''Path-finder class. Implemets jump-point search algorithm.'''
+    '''Path-finder class. Starts jump-point searches (see Search class)
+    Holds no state of searches, so it can serve overlapping requests
+    '''
     def __init__(self, board):
         self.size = board.size
-        width, height = board.size
-        self._field = array([[0 if board.get((x,y)).crossable and \
-            board.get((x,y)).occupied < 2 else -1 for x in range(width)] \
-            for y in range(height)])
+        self.clearance = board.clearance
 
     def find(self, fp, orig, dest):
-        orig, dest = orig.get(), dest.get()
-        self.field = self._field.copy()
-        self.field = dilate(self.field, fp.get_morph_kernel()).astype(int)
-        self.field[self.field == 1] = -1
-        f = self.field
-        if self.acheck(f, dest):
-            dest = self._find_nearest_free(f, dest)
-        self.orig, self.dest = orig, dest
-        self.queue = Queue()
-        self.queue.add(orig)
-        self.sources = self.amake_2d(None, self.size)
-        s = self.sources
-        self.aset(f, self.dest, -3)
-        self.aset(s, self.orig, -2)
-        all_cards = [(0,1), (1,0), (-1,0), (0,-1)]
-        all_diags = [(1,1), (1,-1), (-1,1), (-1,-1)]
-        self.checked = []
-        while not self.queue.is_empty():
-            current = self.queue.pop()
-            if current in self.checked:
-                continue
-            self.checked += [current]
-            try:
-                for delta in all_cards:
-                    if not self._is_bwds(self.aget(s, current), current, delta):
-                        self._expand_card(current, delta)
-                for delta in all_diags:
-                    if not self._is_bwds(self.aget(s, current), current, delta):
-                        self._expand_diag(current, delta)
-            except FoundPath:
-                break
-        nodes = self._find_nodes()
-        return nodes #self._reconstruct(nodes)
-
-    def _find_nearest_free(self, field, coords):
-        xx, yy = point
-        r = 0
-        while True:
-            r += 1
-            for y in range(yy-r, yy+r+1):
-                for x in range(xx-r, xx+r+1):
-                    if not self.acheck(field, (x,y)):
-                        if self.ain_bounds(field, (x,y)):
-                            return x, y
-
-    def _expand_card(self, coords, delta):
-        f = self.field
-        s = self.sources
-        current = coords
-        cost = self.aget(f, coords)
-        delta_x, delta_y = delta
-        while True:
-            cost += 1
-            cx, cy = current
-            current = cx + delta_x, cy + delta_y
-            cx, cy = current
-            if current == self.dest:
-                self.aset(s, current, coords)
-                raise FoundPath()
-            if self.acheck(f, current):
-                return False
-            prev_cost = self.aget(f, current)
-            if prev_cost < cost and prev_cost != 0:
-                return
-            self.aset(s, current, coords)
-            self.aset(f, current, cost)
-            # Check forced neighbours
-            u, b =  self.acheck(f, (cx, cy-1)), self.acheck(f, (cx, cy+1))
-            du = self.acheck(f, (cx+delta_x, cy-1))
-            db = self.acheck(f, (cx+delta_x, cy+1))
-            l, r = self.acheck(f, (cx-1, cy)), self.acheck(f, (cx+1, cy))
-            dl = self.acheck(f, (cx-1, cy+delta_y))
-            dr = self.acheck(f, (cx+1, cy+delta_y))
-            if current != coords and current != self.aget(s, coords):
-                if delta_y == 0 and ((u and not du) or (b and not db)):
-                    self.queue.add(current)
-                    return True
-                if delta_x == 0 and ((l and not dl) or (r and not dr)):
-                    self.queue.add(current)
-                    return True
-
-    def _expand_diag(self, coords, delta):
-        f = self.field
-        s = self.sources
-        current = coords
-        cost = self.aget(f, coords)
-        delta_x, delta_y = delta
-        while True:
-            cost += 1.4
-            cx, cy = current
-            current = cx + delta_x, cy + delta_y
-            cx, cy = current
-            if current == self.dest:
-                self.aset(s, current, coords)
-                raise FoundPath()
-            if self.acheck(f, current):
-                return False
-            prev_cost = self.aget(f, current)
-            if prev_cost < cost and prev_cost != 0:
-                return
-            self.aset(s, current, coords)
-            self.aset(f, current, cost)
-            # Card jumps
-            if self._expand_card(current, (delta_x, 0)):
-                self.queue.add(current)
-            if self._expand_card(current, (0, delta_y)):
-                self.queue.add(current)
-            # Check forced neighbours
-            s1 = self.acheck(f, (cx-delta_x, cy))
-            s2 = self.acheck(f, (cx, cy-delta_y))
-            d1 = self.acheck(f, (cx-delta_x, cy+delta_y))
-            d2 = self.acheck(f, (cx+delta_x, cy-delta_y))
-            if (s1 and not d1) or (s2 and not d2):
-                self.queue.add(current)
+        '''Returns list of jump points (orig excluded) leading to dest
+        Empty list is returned if dest is unreachable
+        '''
+        return self.search(self.clearance.get(fp), orig.get(), dest.get())
 
-    def _find_nodes(self):
-        s = self.sources
-        result = []
-        current = self.dest
-        while current != self.orig:
-            result += [current]
-            current = self.aget(s, current)
-        return result[::-1]
+    def search(self, field, orig, dest):
+        '''Same as find, but runs on given clearance map (True - blocked)
+        orig, dest [2-int tuple] Coordinates of cells
+        '''
+        return self.start(field, orig, dest).run()
+
+    def start(self, field, orig, dest):
+        '''Creates resumable search (params as in search method)'''
+        return Search(self.size, field, orig, dest)
 
-    def _reconstruct(self, nodes):
-        if nodes == []:
-            return []
+    @staticmethod
+    def smooth(field, orig, nodes):
+        '''Removes nodes that can be skipped by going in straight line
+        (string pulling). Returns new list of nodes (orig excluded)
+        field [bool array] Clearance map the nodes were found on
+        orig [2-int tuple] Start of the path
+        '''
+        if len(nodes) < 2:
+            return nodes
+        points = [orig] + nodes
+        xs, ys = [pt[0] for pt in points], [pt[1] for pt in points]
+        x0, y0 = min(xs), min(ys)
+        sight = LineOfSight(field[y0:max(ys)+1, x0:max(xs)+1], (x0, y0))
         result = []
-        for i in range(len(nodes)-1):
-            current = nodes[i]
-            _next = nodes[i+1]
-            result += [current]
-            delta_x, delta_y = self._find_delta(current, _next)
-            while current != _next:
-                cx, cy = current
-                current = cx+delta_x, cy+delta_y
-                result += [current]
-        return result
+        anchor = orig
+        for i in range(1, len(points)-1):
+            if not sight.check(anchor, points[i+1]):
+                result += [points[i]]
+                anchor = points[i]
+        return result + [points[-1]]
+
+    @staticmethod
+    def _find_nearest_free(field, coords):
+        '''Returns free cell nearest to coords (coords if all are blocked)'''
+        if field.all():
+            return coords
+        ys, xs = distance_transform_edt(field, return_distances=False,
+            return_indices=True)
+        x, y = coords
+        return int(xs[y, x]), int(ys[y, x])
+
+    @staticmethod
+    def _get_distance(pta, ptb):
+        '''Octile distance between points'''
+        dx, dy = abs(pta[0]-ptb[0]), abs(pta[1]-ptb[1])
+        return max(dx, dy) + (DIAG_COST-1) * min(dx, dy)
 
     @staticmethod
     def _find_delta(pta, ptb):
@@ -166,48 +77,263 @@ class Pathfinder:
         dy = (1 if ya < yb else -1) if ya != yb else 0
         return dx, dy
 
-    @staticmethod
-    def _is_bwds(pta, ptb, delta):
-        '''Check if when moving along delta from pta, ptb is right behind'''
-        if pta == -2: return False # Nothing is backwards. Used for orig pt
-        try: xa, ya = pta
-        except:
-            raise ValueError('Could not unpack {}, expected 2-tuple'.format(pta))
-        xb, yb = ptb
-        delta_x, delta_y = delta
-        dx = (1 if xa < xb else -1) if xa != xb else 0
-        dy = (1 if ya < yb else -1) if ya != yb else 0
-        if delta_x == -dx and delta_y == -dy:
-            return True
-        return False
-
     ################################
     # Array-related helper methods
 
-    def ain_bounds(self, field, coords):
+    def acheck(self, field, coords):
+        '''Checks if coords are blocked (or out of bounds)'''
         h, w = field.shape
         x, y = coords
-        return (y >= 0 and y < h and x >= 0 and x < w)
-
-    def acheck(self, field, coords, value=-1):
-        if not self.ain_bounds(field, coords):
+        if not (y >= 0 and y < h and x >= 0 and x < w):
             return True
-        h, w = field.shape
-        x, y = coords
-        return field[int(y), int(x)] == value
+        return bool(field[y, x])
 
     def aget(self, field, coords):
+        '''Returns value at coords (-1 if out of bounds)'''
+        h, w = field.shape
         x, y = coords
-        if not self.ain_bounds(field, coords):
+        if not (y >= 0 and y < h and x >= 0 and x < w):
             return -1
         return field[int(y), int(x)]
 
-    def aset(self, field, coords, value):
+
+
+class LineOfSight:
+    '''Checks straight segments between cells of clearance map
+    Segment along a grid line is free if cells on it are free. Other segments
+    are free if all 4 cells around every grid square they pass through are
+    free, so (as with diagonal moves) they never cut corners.
+    field [bool array] Part of clearance map (True - blocked)
+    offset [2-int tuple](0, 0) Coordinates of the first cell of field
+    '''
+    def __init__(self, field, offset=(0, 0)):
+        self.field = field
+        self.offset = offset
+        f = field
+        squares = f[:-1, :-1] | f[:-1, 1:] | f[1:, :-1] | f[1:, 1:]
+        h, w = squares.shape
+        # Counts of blocked squares above each row, per column
+        self.counts = zeros((h+1, w), dtype=int32)
+        cumsum(squares, axis=0, out=self.counts[1:])
+
+    def check(self, pta, ptb):
+        '''Checks if segment between cells is free'''
+        ox, oy = self.offset
+        (ax, ay), (bx, by) = pta, ptb
+        ax, ay, bx, by = ax-ox, ay-oy, bx-ox, by-oy
+        if ax == bx:
+            return not self.field[min(ay, by):max(ay, by)+1, ax].any()
+        if ay == by:
+            return not self.field[ay, min(ax, bx):max(ax, bx)+1].any()
+        if ax > bx:
+            ax, ay, bx, by = bx, by, ax, ay
+        slope = (by-ay) / (bx-ax)
+        cols = arange(ax, bx)
+        ya = around(ay + (cols-ax)*slope, 9)
+        yb = around(ay + (cols-ax+1)*slope, 9)
+        lo = floor(minimum(ya, yb)).astype(int32)
+        hi = ceil(maximum(ya, yb)).astype(int32)
+        return not (self.counts[hi, cols] - self.counts[lo, cols]).any()
+
+
+
+class Search(Pathfinder):
+    '''Single A*-ordered jump-point search
+    Search holds its own state and can be advanced in parts (see step)
+    Diagonal moves are allowed only if both adjacent cardinal cells are free
+    '''
+    def __init__(self, size, field, orig, dest):
+        self.size = size
+        self.field = field
+        if self.acheck(field, dest):
+            dest = self._find_nearest_free(field, dest)
+        self.orig, self.dest = orig, dest
+        self.queue = None
+        self.expanded = 0 # Num of nodes expanded so far
+        self.nodes = [] if orig == dest else None # Set when done
+
+    def is_done(self):
+        return self.nodes is not None
+
+    def run(self):
+        '''Finishes search, returns list of jump points (orig excluded)'''
+        self.step()
+        return self.nodes
+
+    def step(self, limit=None):
+        '''Advances search, returns True when it is done
+        limit [int](None) Max num of nodes expanded, search pauses after them
+        '''
+        if self.nodes is not None:
+            return True
+        if self.queue is None:
+            self._begin()
+        width = self.size[0]
+        closed, costs = self.closed, self.costs
+        stop = None if limit is None else self.expanded + limit
+        while not self.queue.is_empty():
+            if stop is not None and self.expanded >= stop:
+                return False
+            current = self.queue.pop()
+            cx, cy = current
+            if closed[cy, cx]:
+                continue
+            if current == self.dest:
+                self.nodes = self._find_nodes()
+                return True
+            closed[cy, cx] = True
+            self.expanded += 1
+            cost = costs[cy, cx]
+            for delta in self._get_neighbours(current):
+                jump = self._jump(current, delta)
+                if jump is None:
+                    continue
+                jx, jy = jump
+                if closed[jy, jx]:
+                    continue
+                new_cost = cost + self._get_distance(current, jump)
+                if new_cost < costs[jy, jx]:
+                    costs[jy, jx] = new_cost
+                    self.parents[jy, jx] = cy*width + cx
+                    self.queue.add(jump, new_cost, self._get_heuristics(jump))
+        self.nodes = []
+        return True
+
+    def _begin(self):
+        width, height = self.size
+        self.stops = self._make_stops(self.field)
+        self.closed = zeros((height, width), dtype=bool)
+        self.parents = full((height, width), -1, dtype=int32)
+        self.costs = full((height, width), inf)
+        self.queue = Queue()
+        self.costs[self.orig[1], self.orig[0]] = 0
+        self.queue.add(self.orig, 0, self._get_heuristics(self.orig))
+
+    def _get_neighbours(self, coords):
+        '''Returns deltas of directions worth exploring (pruned by parent)'''
+        f = self.field
+        x, y = coords
+        parent = self.aget(self.parents, coords)
+        if parent == -1:
+            return [(dx, dy) for dx, dy in ALL_DELTAS if self._can_step(x,y,dx,dy)]
+        width = self.size[0]
+        px, py = parent % width, parent // width
+        dx = (1 if px < x else -1) if px != x else 0
+        dy = (1 if py < y else -1) if py != y else 0
+        result = []
+        if dx != 0 and dy != 0:
+            free_y = not self.acheck(f, (x, y+dy))
+            free_x = not self.acheck(f, (x+dx, y))
+            if free_y: result += [(0, dy)]
+            if free_x: result += [(dx, 0)]
+            if free_x and free_y: result += [(dx, dy)]
+        elif dx != 0:
+            free_b = not self.acheck(f, (x, y+1))
+            free_u = not self.acheck(f, (x, y-1))
+            if not self.acheck(f, (x+dx, y)):
+                result += [(dx, 0)]
+                if free_b: result += [(dx, 1)]
+                if free_u: result += [(dx, -1)]
+            if free_b: result += [(0, 1)]
+            if free_u: result += [(0, -1)]
+        else:
+            free_r = not self.acheck(f, (x+1, y))
+            free_l = not self.acheck(f, (x-1, y))
+            if not self.acheck(f, (x, y+dy)):
+                result += [(0, dy)]
+                if free_r: result += [(1, dy)]
+                if free_l: result += [(-1, dy)]
+            if free_r: result += [(1, 0)]
+            if free_l: result += [(-1, 0)]
+        return result
+
+    def _can_step(self, x, y, dx, dy):
+        f = self.field
+        if self.acheck(f, (x+dx, y+dy)):
+            return False
+        if dx != 0 and dy != 0:
+            return not self.acheck(f, (x+dx, y)) and \
+                not self.acheck(f, (x, y+dy))
+        return True
+
+    def _jump(self, coords, delta):
+        '''Moves from coords along delta until jump point is found
+        Returns jump point or None if direction leads to obstacle
+        '''
+        f = self.field
+        check = self.acheck
+        dest = self.dest
+        x, y = coords
+        dx, dy = delta
+        if dx != 0 and dy != 0:
+            while True:
+                x, y = x+dx, y+dy
+                if check(f, (x, y)):
+                    return None
+                if (x, y) == dest:
+                    return x, y
+                if self._jump_card((x, y), (dx, 0)) is not None or \
+                        self._jump_card((x, y), (0, dy)) is not None:
+                    return x, y
+                if check(f, (x+dx, y)) or check(f, (x, y+dy)):
+                    return None
+        return self._jump_card(coords, delta)
+
+    def _jump_card(self, coords, delta):
+        '''Cardinal version of _jump. Looks up the first stop cell at once'''
         x, y = coords
-        if not self.ain_bounds(field, coords):
-            return
-        field[int(y), int(x)] = value
+        dx, dy = delta
+        if dx != 0: # Vertical stop arrays are transposed
+            line, pos, step = self.stops[delta][y], x, dx
+            dpos, on_line = self.dest[0], self.dest[1] == y
+        else:
+            line, pos, step = self.stops[delta][x], y, dy
+            dpos, on_line = self.dest[1], self.dest[0] == x
+        if step > 0: part = line[pos+1:]
+        elif pos > 0: part = line[pos-1::-1]
+        else: return None
+        if part.size == 0:
+            return None
+        index = int(part.argmax())
+        hit = bool(part[index])
+        dist = index+1 if hit else part.size
+        if on_line and 0 < (dpos-pos)*step <= dist:
+            return self.dest
+        if not hit:
+            return None
+        x, y = x + dx*dist, y + dy*dist
+        if self.field[y, x]:
+            return None
+        return x, y
 
-    def amake_2d(self, fill, size):
-        w, h = size
-        return array([[fill for x in range(w)] for y in range(h)])
+    @staticmethod
+    def _make_stops(field):
+        '''For each cardinal direction creates bool array of cells at which
+        jump in this direction stops (obstacles and cells with forced neighbours)
+        Arrays of vertical directions are transposed, so lines are rows
+        '''
+        h, w = field.shape
+        padded = ones((h+2, w+2), dtype=bool)
+        padded[1:-1, 1:-1] = field
+        blocked = lambda dx, dy: padded[1+dy:1+dy+h, 1+dx:1+dx+w]
+        stops = {}
+        for d in (1, -1):
+            stops[(d, 0)] = field | (~blocked(0, -1) & blocked(-d, -1)) | \
+                (~blocked(0, 1) & blocked(-d, 1))
+            stops[(0, d)] = (field | (~blocked(-1, 0) & blocked(-1, -d)) | \
+                (~blocked(1, 0) & blocked(1, -d))).T.copy()
+        return stops
+
+    def _get_heuristics(self, coords):
+        '''Octile distance to dest'''
+        return self._get_distance(coords, self.dest)
+
+    def _find_nodes(self):
+        width = self.size[0]
+        result = []
+        current = self.dest
+        while current != self.orig:
+            result += [current]
+            parent = int(self.aget(self.parents, current))
+            current = parent % width, parent // width
+        return result[::-1]
@@ -0,0 +1,68 @@
+import os
+import hashlib
+import yaml
+from numpy import load, save
+import src.system as internal
+
+import logging
+Log = logging.getLogger('MainLogger')
+
+FORMAT_VERSION = 2
+
+class CompiledMap:
+    '''Board data decoded from map PNG, stored next to it
+    (in directory named as PNG, with .cmap suffix instead of extension).
+    Arrays are stored as .npy files and loaded memory-mapped, other data
+    is stored in info.yml. Compiled map is outdated if hash of PNG file
+    and of settings used to compile it does not match.
+    path [str] Path of map PNG
+    settings [tuple] Values that affect compiled data (hashed with PNG)
+    '''
+    ARRAYS = ('terrain', 'variants', 'cells', 'distance')
+    INFO = ('hash', 'size', 'starts', 'toplace')
+
+    def __init__(self, path, settings):
+        self.path = path
+        self.directory = os.path.splitext(path)[0] + '.cmap'
+        with open(path, 'rb') as file:
+            content = file.read()
+        settings = repr((FORMAT_VERSION,) + tuple(settings)).encode()
+        self.hash = hashlib.sha1(content + settings).hexdigest()
+
+    def load(self):
+        '''Returns dict of compiled data or None if it is missing, outdated
+        or corrupt (unreadable info or arrays, missing info keys)
+        '''
+        try:
+            with open(self.get_path('info.yml')) as file:
+                data = yaml.safe_load(file)
+            if not isinstance(data, dict) or \
+                    any(key not in data for key in self.INFO):
+                return None
+            if data['hash'] != self.hash:
+                return None
+            for key in self.ARRAYS:
+                data[key] = load(self.get_path(key + '.npy'), mmap_mode='r')
+        except (OSError, ValueError, KeyError, yaml.YAMLError):
+            return None
+        return data
+
+    def save(self, data):
+        '''Saves dict of compiled data (arrays under ARRAYS keys)
+        Info (holding hash) is written last, so partial writes stay outdated
+        '''
+        info = {k:v for k, v in data.items() if k not in self.ARRAYS}
+        info['hash'] = self.hash
+        try:
+            internal.ifn_mkdir(self.directory)
+            if os.path.exists(self.get_path('info.yml')):
+                os.remove(self.get_path('info.yml'))
+            for key in self.ARRAYS:
+                save(self.get_path(key + '.npy'), data[key])
+            with open(self.get_path('info.yml'), 'w') as file:
+                yaml.safe_dump(info, file)
+        except OSError as err:
+            Log.info('Could not save compiled map: {}'.format(err))
+
+    def get_path(self, name):
+        return os.path.join(self.directory, name)
@@ -1,6 +1,8 @@
+from math import ceil
 from src.gameobj import Object, Controllable
 from src.weapon import Weapon
 from src.geometry import Point
+from src.unitstore import point_view, value_view
 
 class Building(Controllable):
     def __init__(self, sess, coords, ftprint, \
@@ -11,58 +13,145 @@ class Building(Controllable):
 
 
 class Unit(Controllable):
+    '''Kinematic state of unit is kept in session's UnitStore,
+    attributes below are views over unit's row of its arrays
+    '''
+    coords = point_view('coords')
+    dest = point_view('dest')
+    node = point_view('node')
+    direction = point_view('direction')
+    steps = value_view('steps') # Steps left to reach node
+    direction_cost = value_view('direction_cost')
+    speed = value_view('speed')
+
     def __init__(self, sess, coords, ftprint, \
             heal_pts, owner, armor, weapon, speed):
         if speed is None:
             raise ValueError('Unit speed was not specified')
+        self.slot = sess.units.add(self, ftprint)
         super().__init__(sess, coords, ftprint, heal_pts, owner, armor, weapon)
         self.speed = speed
         self.dest = self.coords
         self.node = Point(-1, -1)
         self.direction = Point(0, 0)
+        self.steps = 0
         self.nodes = []
+        self.path_ticket = None # Set while path request is pending
         self.otype = 'U'
         self.add_cmd('stop', self.session.cmds.stop, (1,0))
         self.add_cmd('move', self.session.cmds.move, (2,0))
 
     def update(self, tick):
         super().update(tick)
+        if self.path_ticket is not None:
+            return
+        if self.session.units.advance(self):
+            return # Moved to target planned by UnitStore.plan
+        self.move()
+
+    def move(self):
+        '''Moves unit along its path while it has speed points left in this
+        tick. Steps along a segment are taken at once, footprint is swept
+        through all of them by a single board update.
+        '''
+        board = self.session.board
+        coords, dest, steps = self.coords, self.dest, self.steps
+        node, direction = self.node, self.direction
+        cost, speed = self.direction_cost, self.speed
         points = 0
-        while self.coords != self.dest and points < self.speed:
-            prev = self.coords.copy()
-            self.session.board.release_fp(self)
-            self.session.tell_tell_dirty()
-            if self._get_direction(self.coords, self.node) != self.direction:
-                self.node = self.nodes[0]
+        blocked = False
+        moved = False
+        while coords != dest and points < speed:
+            if steps == 0:
+                if not self.nodes:
+                    break
+                node = self.nodes[0]
                 self.nodes = self.nodes[1:]
-                self.direction = self._get_direction(self.coords, self.node)
-                self.direction_cost = self._get_dir_cost(self.direction)
-            points += self.direction_cost
-            self.coords = self.coords + self.direction
-            self.coords.round(2)
-            if not self.session.board.apply_fp(self):
-                self.coords = prev
-                self.session.board.apply_fp(self)
-                self.dest = self.coords.copy()
-                self.node = Point(-1, -1)
-                self.direction = Point(0, 0)
-                self.nodes = []
+                direction, steps = self._get_direction(coords, node)
+                cost = self._get_dir_cost(direction)
+            # Steps taken while spent points are below speed
+            taken = min(steps, ceil(round((speed - points) / cost, 6)))
+            points += taken * cost
+            path = [coords + direction*i for i in range(1, taken)]
+            # Last step lands exactly on node
+            path += [node.copy() if taken == steps \
+                else coords + direction*taken]
+            done = board.sweep_fp(self, coords, path)
+            if done > 0:
+                coords = path[done-1]
+                steps -= done
+                moved = True
+                self.session.tell_tell_dirty()
+            if done < taken:
+                blocked = True
+                break
+        self.coords, self.dest, self.steps = coords, dest, steps
+        self.node, self.direction = node, direction
+        self.direction_cost = cost
+        if blocked:
+            self.tell_blocked()
+        if moved:
+            self.session.tell_moved(self)
+
+    def tell_blocked(self):
+        '''Handles move blocked by another object. Unit waits if its route
+        is being re-planned and stops otherwise
+        '''
+        if self.session.paths.is_stale(self):
+            return
+        self.dest = self.coords.copy()
+        self.node = Point(-1, -1)
+        self.direction = Point(0, 0)
+        self.steps = 0
+        self.nodes = []
 
     def request_path(self):
-        self.nodes = self.session.board.request_path( \
-            self.footprint, self.coords, self.dest)
+        '''Requests path to dest. Unit waits until it is delivered'''
+        self.nodes = []
         self.node = Point(-1, -1)
         self.direction = Point(0, 0)
+        self.steps = 0
+        self.session.paths.request(self)
+        self.session.tell_active(self)
+
+    def is_idle(self):
+        return super().is_idle() and self.path_ticket is None and \
+            self.coords == self.dest
+
+    def get_route(self):
+        '''Returns cells (2-int tuples) of remaining route, starting at unit'''
+        route = [(int(self.coords.x), int(self.coords.y))]
+        if self.steps > 0:
+            route += [(int(self.node.x), int(self.node.y))]
+        return route + [(int(pt.x), int(pt.y)) for pt in self.nodes]
+
+    def tell_path(self, nodes):
+        '''Receives requested path'''
+        # Path starts at cell unit was in at request time, unit goes there first
+        start = Point(int(self.coords.x), int(self.coords.y))
+        if nodes and start != self.coords:
+            nodes = [start] + nodes
+        self.nodes = nodes
+        # Dest could have been unreachable or moved to the nearest free cell
+        self.dest = self.nodes[-1].copy() if self.nodes else self.coords.copy()
+        self.node = Point(-1, -1)
+        self.direction = Point(0, 0)
+        self.steps = 0
 
     def _get_direction(self, orig, dest):
-        dx = (1 if orig.x < dest.x else -1) if orig.x != dest.x else 0
-        dy = (1 if orig.y < dest.y else -1) if orig.y != dest.y else 0
+        '''Returns step (moving at most one subcell along each axis) of
+        straight line from orig to dest and number of such steps
+        '''
         sub_per_cell = self.session.request_subpercell()
-        return Point(dx/sub_per_cell, dy/sub_per_cell)
+        dx, dy = dest.x-orig.x, dest.y-orig.y
+        steps = max(ceil(round(max(abs(dx), abs(dy))*sub_per_cell, 6)), 1)
+        return Point(dx/steps, dy/steps), steps
 
     def _get_dir_cost(self, direction):
-        dx, dy = direction.get()
-        return 1.4 if (dx != 0 and dy != 0) else 1
+        '''Octile length of step in subcells (diagonal step costs 1.4)'''
+        sub_per_cell = self.session.request_subpercell()
+        dx, dy = abs(direction.x)*sub_per_cell, abs(direction.y)*sub_per_cell
+        return max(dx, dy) + 0.4*min(dx, dy)
 
 
 
@@ -0,0 +1,111 @@
+from collections import OrderedDict
+from sys import getsizeof
+from numpy import linspace
+
+def get_window_regions(window, size):
+    '''Returns regions (blocks of size*size cells) overlapping window'''
+    x0, y0, x1, y1 = window
+    return [(i, j) for j in range(max(y0, 0)//size, (max(y1, 1)-1)//size+1)
+        for i in range(max(x0, 0)//size, (max(x1, 1)-1)//size+1)]
+
+def get_path_regions(cells, size):
+    '''Returns set of regions crossed by path going through cells
+    Segments are sampled at least twice per cell
+    '''
+    x, y = cells[0]
+    result = {(x//size, y//size)}
+    for cell in cells[1:]:
+        count = 2*max(abs(cell[0]-x), abs(cell[1]-y)) + 1
+        xs = linspace(x, cell[0], count) // size
+        ys = linspace(y, cell[1], count) // size
+        result.update(zip(xs.astype(int).tolist(), ys.astype(int).tolist()))
+        x, y = cell
+    return result
+
+
+class PathCache:
+    '''LRU cache of found paths
+    Paths are keyed by footprint class (clearance key), origin and destination
+    cells. Each path records board regions (square blocks of cells) it
+    crosses, so a change of the board evicts only paths passing through
+    changed regions. Paths found with board state older than the last change
+    of their regions are not stored.
+    '''
+    def __init__(self, capacity, region):
+        self.capacity = capacity
+        self.region = region
+        self.entries = OrderedDict() # key -> (nodes, regions, size)
+        self.index = {} # region -> set of keys
+        self.version = 0
+        self.changed = {} # region -> version of its last change
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0 # Removed by board changes
+        self.expired = 0 # Removed as least recently used
+        self.memory = 0 # Estimated size of stored paths [B]
+
+    def get(self, key):
+        '''Returns nodes (list of 2-int tuples) of cached path or None
+        key [tuple] clearance key, orig cell, dest cell
+        '''
+        try: entry = self.entries[key]
+        except KeyError:
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[0]
+
+    def put(self, key, nodes, stamp):
+        '''Stores path. Nothing is stored if it crosses a region that has
+        changed after the path was requested
+        nodes [list] Nodes as returned by pathfinding (orig excluded)
+        stamp [int] Value of version at request time
+        '''
+        if self.capacity <= 0 or key in self.entries:
+            return
+        orig = key[1]
+        cells = [orig] + [tuple(node) for node in nodes]
+        regions = get_path_regions(cells, self.region)
+        if any(self.changed.get(r, 0) > stamp for r in regions):
+            return
+        if len(self.entries) >= self.capacity:
+            self._remove(next(iter(self.entries)))
+            self.expired += 1
+        size = getsizeof(cells) + sum(getsizeof(c) for c in cells)
+        self.entries[key] = (cells[1:], regions, size)
+        for r in regions:
+            self.index.setdefault(r, set()).add(key)
+        self.memory += size
+
+    def tell_changed(self, window):
+        '''Evicts paths crossing regions overlapping window (x0, y0, x1, y1)'''
+        self.version += 1
+        for r in get_window_regions(window, self.region):
+            self.changed[r] = self.version
+            for key in self.index.pop(r, ()):
+                if key in self.entries:
+                    self._remove(key)
+                    self.evictions += 1
+
+    def get_stats(self):
+        '''Returns dict of counters'''
+        total = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0,
+            'evictions': self.evictions,
+            'expired': self.expired,
+            'memory': self.memory,
+        }
+
+    def _remove(self, key):
+        nodes, regions, size = self.entries.pop(key)
+        for r in regions:
+            keys = self.index.get(r)
+            if keys is not None:
+                keys.discard(key)
+        self.memory -= size
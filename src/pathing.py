@@ -0,0 +1,243 @@
+from concurrent.futures import ThreadPoolExecutor
+from src.geometry import Point
+from src.pathcache import get_window_regions, get_path_regions
+
+import logging
+Log = logging.getLogger('MainLogger')
+
+class PathJob:
+    '''Path request prepared by Board.plan_path
+    Tries flow field, then hierarchical graph, then jump-point search
+    Only the last one is resumable, others are quick and done at once
+    Work is counted in node expansions, all steps done before the search
+    are charged as START_WORK of them
+    Found nodes are smoothed, so consecutive nodes can lie at any angle
+    nodes [list](None) Known result (e.g. cached path), job is done at once
+    key [tuple](None) Path cache key, result is stored under it when done
+    stamp [int](None) Path cache version at the time of request
+    '''
+    START_WORK = 100 # About as long as graph search
+
+    def __init__(self, board, field, orig, dest, flow=None, graph=None,
+            nodes=None, key=None, stamp=None):
+        self.board = board
+        self.field = field
+        self.orig, self.dest = orig, dest
+        self.flow = flow
+        self.graph = graph
+        self.key, self.stamp = key, stamp
+        self.search = None
+        self.work = 0 # Units of work done so far (see step)
+        self.nodes = None # Set when done
+        if nodes is not None:
+            self.nodes = [Point(*pt) for pt in nodes]
+
+    def is_done(self):
+        return self.nodes is not None
+
+    def run(self):
+        '''Finishes job, returns list of nodes (Points)'''
+        self.step()
+        return self.nodes
+
+    def step(self, limit=None):
+        '''Advances job, returns True when it is done
+        limit [int](None) Max units of work (node expansions), job pauses
+            after them
+        '''
+        if self.nodes is not None:
+            return True
+        if self.search is None:
+            self.work += self.START_WORK
+            nodes = None
+            if self.flow is not None:
+                nodes = self.flow.get_path(self.orig)
+            if nodes is None and self.graph is not None:
+                nodes = self.board.hpa.search(self.graph, self.orig, self.dest)
+            if nodes is not None:
+                self._finish(nodes)
+                return True
+            # Close, blocked or unreachable dest
+            self.search = self.board.finder.start(self.field,
+                self.orig, self.dest)
+            if limit is not None:
+                limit -= self.START_WORK
+        expanded = self.search.expanded
+        done = self.search.step(limit)
+        self.work += self.search.expanded - expanded
+        if not done:
+            return False
+        self._finish(self.search.nodes)
+        return True
+
+    def _finish(self, nodes):
+        nodes = self.board.finder.smooth(self.field, self.orig, nodes)
+        self.nodes = [Point(*pt) for pt in nodes]
+
+
+
+class PathTicket:
+    '''Pending path request of a unit
+    Result is handed to the unit at due tick, never earlier
+    '''
+    def __init__(self, unit, due, job):
+        self.unit = unit
+        self.due = due
+        self.job = job
+        self.future = None
+        self.cancelled = False
+
+
+
+class RouteIndex:
+    '''Index of board regions crossed by routes of moving units
+    Routes shrink as units move, so they are checked again before use
+    '''
+    def __init__(self, region):
+        self.region = region
+        self.units = {} # region -> units (dict used as ordered set)
+        self.regions = {} # unit -> regions
+
+    def add(self, unit):
+        '''Indexes remaining route of unit'''
+        self.remove(unit)
+        route = unit.get_route()
+        if len(route) < 2:
+            return
+        regions = get_path_regions(route, self.region)
+        self.regions[unit] = regions
+        for r in regions:
+            self.units.setdefault(r, {})[unit] = None
+
+    def remove(self, unit):
+        for r in self.regions.pop(unit, ()):
+            self.units[r].pop(unit, None)
+
+    def get_affected(self, window):
+        '''Returns units whose remaining routes cross regions overlapping
+        window (x0, y0, x1, y1)
+        '''
+        regions = set(get_window_regions(window, self.region))
+        result = {}
+        for r in sorted(regions):
+            for unit in self.units.get(r, ()):
+                result[unit] = None
+        affected = []
+        for unit in result:
+            route = unit.get_route()
+            if len(route) >= 2 and \
+                    regions & get_path_regions(route, self.region):
+                affected += [unit]
+            else:
+                self.add(unit) # Route was left behind, shrink it
+        return affected
+
+
+
+class PathService:
+    '''Resolves path requests of units
+    Jobs are either run in worker threads or advanced by the session within
+    per-tick budget of node expansions. Jobs only use board state captured
+    at request time. Results of worker threads are delivered exactly delay
+    ticks after request. Time-sliced results are delivered at the first
+    tick (not earlier than delay ticks after request) their job is done at.
+    Budget counts work, not time, so in both cases outcome does not depend
+    on timing. With neither workers nor budget, requests are resolved
+    instantly.
+    Routes of units are indexed by board regions. When the board changes,
+    units whose routes cross changed regions are queued and re-planned,
+    at most repath_rate of them per tick.
+    '''
+    def __init__(self, session, workers, budget, delay, region, repath_rate):
+        self.session = session
+        self.budget = budget # Node expansions per tick
+        self.credit = 0 # Expansions left (negative if overspent)
+        self.delay = delay
+        self.pending = []
+        self.pool = ThreadPoolExecutor(workers) if workers > 0 else None
+        self.routes = RouteIndex(region)
+        self.stale = {} # Units waiting for re-planning (ordered set)
+        self.repath_rate = repath_rate
+
+    def request(self, unit):
+        '''Starts path search for unit (from its coords to its dest)'''
+        self.cancel(unit)
+        board = self.session.board
+        if self.pool is None and self.budget <= 0:
+            self._deliver(unit, board.request_path(unit.footprint,
+                unit.coords, unit.dest))
+            return None
+        job = board.plan_path(unit.footprint, unit.coords, unit.dest)
+        ticket = PathTicket(unit, self.session.tick + self.delay, job)
+        if self.pool is not None:
+            ticket.future = self.pool.submit(job.run)
+        self.pending += [ticket]
+        unit.path_ticket = ticket
+        return ticket
+
+    def cancel(self, unit):
+        '''Cancels pending request of unit (if there is one)'''
+        self.routes.remove(unit)
+        self.stale.pop(unit, None)
+        ticket = unit.path_ticket
+        if ticket is None:
+            return
+        ticket.cancelled = True
+        if ticket.future is not None:
+            ticket.future.cancel()
+        unit.path_ticket = None
+
+    def is_stale(self, unit):
+        '''Checks if unit waits for re-planning of its route'''
+        return unit in self.stale
+
+    def tell_changed(self, window):
+        '''Queues units with routes near window (x0, y0, x1, y1) for
+        re-planning
+        '''
+        for unit in self.routes.get_affected(window):
+            self.stale[unit] = None
+
+    def update(self, tick):
+        '''Re-plans some of stale routes, advances time-sliced jobs within
+        budget and delivers results of requests that are due (in request order)
+        '''
+        for unit in list(self.stale)[:self.repath_rate]:
+            self.request(unit)
+        if not self.pending:
+            return
+        if self.pool is None:
+            # Work done over budget (e.g. graph search) is paid in next ticks
+            self.credit = min(self.credit + self.budget, self.budget)
+            for ticket in self.pending:
+                if self.credit <= 0: break
+                if ticket.cancelled: continue
+                job = ticket.job
+                work = job.work
+                job.step(max(self.credit, 0))
+                self.credit -= job.work - work
+        remaining = []
+        for ticket in self.pending:
+            if ticket.cancelled:
+                continue
+            if ticket.due > tick or \
+                    (ticket.future is None and not ticket.job.is_done()):
+                remaining += [ticket]
+                continue
+            if ticket.future is not None:
+                nodes = ticket.future.result() # Waits if not done yet
+            else:
+                nodes = ticket.job.nodes
+            self.session.board.tell_path_done(ticket.job)
+            ticket.unit.path_ticket = None
+            self._deliver(ticket.unit, nodes)
+        self.pending = remaining
+
+    def _deliver(self, unit, nodes):
+        unit.tell_path(nodes)
+        self.routes.add(unit)
+
+    def close(self):
+        if self.pool is not None:
+            Log.debug('Stopping path workers')
+            self.pool.shutdown(wait=False)
@@ -1,5 +1,9 @@
 import src.objects as o
 from src.cmd_defines import AllCommands
+from src.command import CommandTimers
+from src.pathing import PathService
+from src.spatial import SpatialHash
+from src.unitstore import UnitStore
 
 import logging
 Log = logging.getLogger('MainLogger')
@@ -12,9 +16,14 @@ class Session:
         self.is_paused = True
         self.tick = 0
         self.players = []
+        self.weapon_reach = 0 # Max weapon range of added objects
         self.objects = []
+        self.active = {} # Objects updated every tick (dict used as ordered set)
         self.ticks_per_sec = self.app.GAME.ticks_per_sec
         self.cmds = AllCommands()
+        self.timers = CommandTimers()
+        self.spatial = SpatialHash(self.app.CORE.spatial_bucket)
+        self.units = UnitStore(self)
 
     def reinit(self, app):
         self.app = app
@@ -25,12 +34,22 @@ class Session:
 
     def update(self):
         self.tick += 1
-        for obj in self.objects:
+        self.paths.update(self.tick)
+        for scmd in self.timers.pop_due(self.tick):
+            scmd.actor.tell_cmd_done(scmd)
+        self.units.plan()
+        for obj in list(self.active):
+            if obj not in self.active: continue # Removed during this tick
             obj.update(self.tick)
+            if obj.is_idle():
+                del self.active[obj]
 
     def set_board(self, board):
         Log.debug('Adding board to session')
         self.board = board
+        core = self.app.CORE
+        self.paths = PathService(self, core.path_workers, core.path_budget,
+            core.path_delay, core.path_cache_region, core.repath_per_tick)
         for point, key in board.toplace:
             if 'norm' in key or 'rich' in key: # Resource
                 value = self.app.GAME.rsrc_rich_value if 'rich' in key \
@@ -45,11 +64,16 @@ class Session:
 
     def add_object(self, obj):
         self.objects += [obj]
+        self.spatial.add(obj)
+        self.tell_active(obj)
         if obj.otype == 'B': obj.owner.blnd_count += 1
         if obj.otype == 'U': obj.owner.unit_count += 1
         if not self.board.apply_fp(obj):
             self.rem_object(obj)
             return False
+        try: self.weapon_reach = max(self.weapon_reach, obj.weapon.range)
+        except AttributeError: pass # Obj has no weapon
+        self.wake_enemies(obj)
         if self.reinitialized: self.tell_tell_dirty()
         return True
 
@@ -66,12 +90,20 @@ class Session:
             pass
         self.tell_tell_dirty()
         self.board.release_fp(obj)
-        try: self.app.selection.remove(obj)
-        except ValueError: pass
+        self.board.tell_removed(obj)
+        self.spatial.remove(obj)
+        self.active.pop(obj, None)
+        self.timers.discard(obj)
+        if obj.otype == 'U':
+            self.paths.cancel(obj)
+            self.units.remove(obj)
         try: self.objects.remove(obj)
         except ValueError: pass
         del obj
 
+    def cleanup(self):
+        self.paths.close()
+
     def add_player(self, player):
         Log.info('Adding player {}'.format(player.username))
         self.players += [player]
@@ -100,6 +132,28 @@ class Session:
         else:
             self.is_paused = force
 
+    def tell_active(self, obj):
+        '''Makes obj updated every tick until it becomes idle
+        Call when obj gets something to do (command, movement, cooldown)
+        '''
+        self.active[obj] = None
+
+    def tell_moved(self, obj):
+        '''Updates spatial hash after obj has moved'''
+        self.spatial.move(obj)
+        self.wake_enemies(obj)
+
+    def wake_enemies(self, obj):
+        '''Makes idle armed enemies that may have obj in range updated'''
+        if len(self.players) < 2:
+            return
+        for other in self.spatial.query_radius(obj.coords, self.weapon_reach):
+            if other in self.active: continue
+            try:
+                if not other.weapon.is_placeholder and other.is_enemy(obj):
+                    self.tell_active(other)
+            except AttributeError: pass # Other has no weapon
+
     def tell_destroyed(self, obj):
         self.rem_object(obj)
 
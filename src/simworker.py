@@ -0,0 +1,180 @@
+from collections import namedtuple
+from queue import SimpleQueue, Empty
+from threading import Thread
+from time import perf_counter_ns, sleep
+import sys
+import src.system as internal
+
+import logging
+Log = logging.getLogger('MainLogger')
+
+ObjectView = namedtuple('ObjectView',
+    'obj objkey otype x y size is_square color')
+
+class SelectedView(namedtuple('SelectedView',
+        'obj objkey address attrs owner commands progress')):
+    '''Console data of selected object, taken in simulation thread
+    attrs [dict] Result of get_attrs
+    owner [Player] Owner of object (None if it has none)
+    commands [dict] Key -> (command, position), empty if obj has none
+    progress [int] Completion percentage of current command (or None)
+    '''
+    def get_cmd(self, pos):
+        for key, cmd in self.commands.items():
+            command, position = cmd
+            if position == pos:
+                return key, command
+        return None, None
+
+
+class Snapshot(namedtuple('Snapshot',
+        'tick objects resources squares selection dropped')):
+    '''Immutable state of session published after a tick, drawn by UI
+    tick [int] Session tick
+    objects [tuple] ObjectViews of objects near viewport (in drawing order)
+    resources [3-int tuple] Wood, iron and fuel of local player
+    squares [numpy array] Copy of board cells taken by square footprints
+        (shared by snapshots until squares change, never written to)
+    selection [tuple] SelectedViews of UI selection (objects still alive)
+    dropped [tuple] Objects of UI selection removed from session
+    '''
+    def get_object(self, coords):
+        '''Returns object with footprint covering coords (x, y) or None'''
+        x, y = coords
+        for view in reversed(self.objects):
+            if view.is_square: # Same cells as Board.get_sqr_window
+                lo, hi = -view.size//2 + 1, view.size//2 + 1
+                if view.x+lo <= x < view.x+hi and view.y+lo <= y < view.y+hi:
+                    return view.obj
+            elif (view.x-x)**2 + (view.y-y)**2 <= (view.size/2)**2:
+                return view.obj
+        return None
+
+
+
+class FixedStep:
+    '''Fixed timestep clock. Steps are due every step_len, missed steps are
+    caught up (at most max_catchup at once, the rest is dropped)
+    rate [int] Steps per second
+    max_catchup [int] Max num of steps returned by single update
+    '''
+    def __init__(self, rate, max_catchup):
+        self.step_len = 10**9 // rate # [ns]
+        self.max_catchup = max_catchup
+        self.next_step = perf_counter_ns() + self.step_len
+        # Totals
+        self.steps = 0
+        self.dropped = 0
+
+    def update(self):
+        '''Returns num of steps due since last call'''
+        now = perf_counter_ns()
+        if now < self.next_step:
+            return 0
+        due = (now - self.next_step) // self.step_len + 1
+        if due > self.max_catchup:
+            self.dropped += due - self.max_catchup
+            due = self.max_catchup
+            self.next_step = now + self.step_len # Skips dropped steps
+        else:
+            self.next_step += due * self.step_len
+        self.steps += due
+        return due
+
+    def get_delay(self):
+        '''Returns time left to next step [s]'''
+        return max(self.next_step - perf_counter_ns(), 0) / 1e9
+
+
+
+class SimulationWorker(Thread):
+    '''Steps session on its own thread, at fixed rate
+    Commands from UI are queued and applied at tick boundaries. After each
+    batch of ticks, a new Snapshot replaces the published one.
+    session [Session] Game session
+    player [Player] Local player (resources are published)
+    ticks_per_sec [int] Tick rate
+    max_catchup [int] Max num of missed ticks run at once
+    '''
+    def __init__(self, session, player, ticks_per_sec, max_catchup):
+        super().__init__(name='Simulation', daemon=True)
+        self.session = session
+        self.player = player
+        self.clock = FixedStep(ticks_per_sec, max_catchup)
+        self.commands = SimpleQueue()
+        self.viewport = None # (x0, y0, x1, y1) in cells, set by UI
+        self.selection = () # Objects selected in UI, set by UI
+        self.squares, self.squares_version = None, None
+        self.running = True
+        self.error = None # Exception that stopped the thread
+        self.snapshot = self.make_snapshot()
+
+    def submit(self, func, *args, **kwargs):
+        '''Queues call to be done in simulation thread before next tick'''
+        self.commands.put((func, args, kwargs))
+
+    def run(self):
+        '''Steps session until stopped or until exception is raised
+        Exception is logged and kept in error, UI checks it every frame
+        '''
+        Log.debug('Starting simulation thread')
+        while self.running:
+            try:
+                due = self.clock.update()
+                if not due:
+                    sleep(self.clock.get_delay())
+                    continue
+                for i in range(due):
+                    self.apply_commands()
+                    self.session.update()
+                self.snapshot = self.make_snapshot()
+            except Exception as err:
+                internal.log_exception(*sys.exc_info())
+                self.error = err
+                self.running = False
+
+    def stop(self):
+        self.running = False
+        if self.is_alive():
+            self.join()
+
+    def apply_commands(self):
+        while True:
+            try: func, args, kwargs = self.commands.get_nowait()
+            except Empty: return
+            func(*args, **kwargs)
+
+    def make_snapshot(self):
+        session = self.session
+        if self.viewport is None:
+            objects = session.objects
+        else:
+            objects = session.spatial.query_rect(*self.viewport)
+        selection, dropped = [], []
+        for obj in self.selection:
+            if obj in session.spatial: selection += [obj]
+            else: dropped += [obj]
+        board = session.board
+        if self.squares_version != board.squares_version:
+            self.squares = board.squares.copy()
+            self.squares_version = board.squares_version
+        views = []
+        for obj in objects:
+            try: color = obj.owner.clr_choice
+            except AttributeError: color = None
+            fp = obj.footprint
+            views += [ObjectView(obj, obj.objkey, obj.otype, obj.coords.x,
+                obj.coords.y, fp.size, fp.is_square, color)]
+        player = self.player
+        resources = (player.r_wood, player.r_iron, player.r_fuel) \
+            if hasattr(player, 'r_wood') else (0, 0, 0)
+        return Snapshot(session.tick, tuple(views), resources, self.squares,
+            tuple(self.make_selected(obj) for obj in selection), tuple(dropped))
+
+    @staticmethod
+    def make_selected(obj):
+        try: progress = obj.get_cmd_perc()
+        except AttributeError: progress = None # Obj takes no commands
+        return SelectedView(obj, obj.objkey, obj.get_address(),
+            obj.get_attrs(), getattr(obj, 'owner', None),
+            dict(getattr(obj, 'commands', {})), progress)
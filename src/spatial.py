@@ -0,0 +1,130 @@
+from heapq import nsmallest
+from itertools import count
+from math import hypot
+
+class SpatialHash:
+    '''Uniform grid of buckets holding objects placed on board
+    Object is kept in the bucket of its central point, queries look up only
+    buckets around the queried area. Results are ordered as objects were
+    added (or by distance for nearest), so they do not depend on bucket
+    layout.
+    bucket [int] Side of bucket (in cells)
+    '''
+    def __init__(self, bucket):
+        self.bucket = bucket
+        self.buckets = {} # (bx, by) -> objects (dict used as ordered set)
+        self.where = {} # object -> (bx, by)
+        self.order = {} # object -> sequence number
+        self.counter = count()
+        self.reach = 0 # Max footprint size of added objects
+
+    def __contains__(self, obj):
+        return obj in self.where
+
+    def add(self, obj):
+        key = self._get_key(obj.coords.x, obj.coords.y)
+        self.buckets.setdefault(key, {})[obj] = None
+        self.where[obj] = key
+        self.order[obj] = next(self.counter)
+        self.reach = max(self.reach, obj.footprint.size)
+
+    def remove(self, obj):
+        key = self.where.pop(obj, None)
+        if key is None:
+            return
+        del self.order[obj]
+        bucket = self.buckets[key]
+        del bucket[obj]
+        if not bucket:
+            del self.buckets[key]
+
+    def move(self, obj):
+        '''Updates bucket of obj after its coords have changed'''
+        key = self._get_key(obj.coords.x, obj.coords.y)
+        old = self.where.get(obj)
+        if old is None or old == key:
+            return
+        bucket = self.buckets[old]
+        del bucket[obj]
+        if not bucket:
+            del self.buckets[old]
+        self.buckets.setdefault(key, {})[obj] = None
+        self.where[obj] = key
+
+    def query_rect(self, x0, y0, x1, y1):
+        '''Returns objects with footprints that may overlap rectangle
+        (central point closer to it than footprint size)
+        '''
+        m = self.reach
+        result = []
+        for obj in self._scan(x0-m, y0-m, x1+m, y1+m):
+            s = obj.footprint.size
+            x, y = obj.coords.x, obj.coords.y
+            if x+s > x0 and x-s < x1 and y+s > y0 and y-s < y1:
+                result += [obj]
+        return self._sort(result)
+
+    def query_radius(self, center, radius):
+        '''Returns objects with central points within radius from center'''
+        cx, cy = center.x, center.y
+        result = [obj for obj in self._scan(cx-radius, cy-radius,
+            cx+radius, cy+radius) if hypot(obj.coords.x-cx,
+            obj.coords.y-cy) <= radius]
+        return self._sort(result)
+
+    def nearest(self, center, k, radius=None, exclude=None):
+        '''Returns up to k objects nearest to center (closest first)
+        radius [float](None) Max distance of returned objects
+        exclude [object](None) Object left out of results (e.g. asking one)
+        '''
+        cx, cy = center.x, center.y
+        qx, qy = self._get_key(cx, cy)
+        found, seen, ring = [], 0, 0
+        total = len(self.where) - (exclude in self.where)
+        while seen < total:
+            if radius is not None and (ring-1)*self.bucket > radius:
+                break
+            for key in self._get_ring(qx, qy, ring):
+                for obj in self.buckets.get(key, ()):
+                    if obj is exclude: continue
+                    seen += 1
+                    dist = hypot(obj.coords.x-cx, obj.coords.y-cy)
+                    if radius is None or dist <= radius:
+                        found += [(dist, self.order[obj], obj)]
+            # Objects in further rings are at least ring*bucket away
+            if len(found) >= k and \
+                    nsmallest(k, found)[-1][0] <= ring*self.bucket:
+                break
+            ring += 1
+        return [obj for dist, order, obj in nsmallest(k, found)]
+
+    def _scan(self, x0, y0, x1, y1):
+        '''Yields objects from buckets overlapping rectangle'''
+        bx0, by0 = self._get_key(x0, y0)
+        bx1, by1 = self._get_key(x1, y1)
+        if (bx1-bx0+1) * (by1-by0+1) > len(self.buckets):
+            # Area is large, it is faster to check occupied buckets only
+            for (bx, by), bucket in self.buckets.items():
+                if bx0 <= bx <= bx1 and by0 <= by <= by1:
+                    yield from bucket
+            return
+        for by in range(by0, by1+1):
+            for bx in range(bx0, bx1+1):
+                yield from self.buckets.get((bx, by), ())
+
+    def _sort(self, objs):
+        return sorted(objs, key=self.order.__getitem__)
+
+    def _get_key(self, x, y):
+        return int(x//self.bucket), int(y//self.bucket)
+
+    @staticmethod
+    def _get_ring(qx, qy, ring):
+        '''Returns keys of buckets at Chebyshev distance ring from (qx, qy)'''
+        if ring == 0:
+            return [(qx, qy)]
+        keys = [(qx+i, qy-ring) for i in range(-ring, ring+1)]
+        keys += [(qx+i, qy+ring) for i in range(-ring, ring+1)]
+        keys += [(qx-ring, qy+j) for j in range(-ring+1, ring)]
+        keys += [(qx+ring, qy+j) for j in range(-ring+1, ring)]
+        return keys
@@ -36,19 +36,21 @@ def ifn_mkdir(directory):
     if not os.path.exists(directory):
         os.makedirs(directory)
 
+def log_exception(type, value, traceback):
+    '''Logs exception info (with traceback) as error'''
+    traceback = ''.join(trb.format_tb(traceback))
+    m = 'An exception occurred:\n'+'-'*64+'\n'
+    if len(traceback) > 0:
+        m += 'Traceback (most recent call last):\n'+traceback+'\n'
+    else:
+        m += 'No traceback available\n'
+    m += type.__name__+': '+str(value)
+    m +='\n'+'-'*64+'\n'
+    Log.error(m)
+
 def define_loggable_exceptions():
     '''Modifies system function that shows exception info'''
-    def _excepthook(type, value, traceback):
-        traceback = ''.join(trb.format_tb(traceback))
-        m = 'An exception occurred:\n'+'-'*64+'\n'
-        if len(traceback) > 0:
-            m += 'Traceback (most recent call last):\n'+traceback+'\n'
-        else:
-            m += 'No traceback available\n'
-        m += type.__name__+': '+str(value)
-        m +='\n'+'-'*64+'\n'
-        Log.error(m)
-    sys.excepthook = _excepthook
+    sys.excepthook = log_exception
 
 def configure_logger(use_debug=False):
     '''Initializes logger with console handler'''
@@ -71,3 +73,20 @@ def configure_argparser():
     parser.add_argument('-d', '--debug',
         help='Enables debug info in game', action='store_true')
     return parser
+
+def configure_sim_argparser():
+    '''Creates and configures parser object of headless simulation'''
+    parser = ArgumentParser('Simulation')
+    parser.add_argument('map', nargs='?', default='first',
+        help='Name of map in board directory')
+    parser.add_argument('-t', '--ticks', type=int, default=1000,
+        help='Num of ticks to run')
+    parser.add_argument('-p', '--players', type=int, default=1,
+        help='Num of players')
+    parser.add_argument('-u', '--units', type=int, default=0,
+        help='Num of workers added for each player')
+    parser.add_argument('-s', '--script',
+        help='YAML file with list of scripted commands')
+    parser.add_argument('-v', '--verbose',
+        help='Changes logging level to debug', action='store_true')
+    return parser
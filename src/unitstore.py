@@ -0,0 +1,164 @@
+from heapq import heappush, heappop
+from numpy import zeros, ceil, rint, minimum, maximum, stack, \
+    flatnonzero, errstate, int64
+from src.geometry import Point
+from src.footprint import PHASES
+
+def point_view(field):
+    '''Creates property exposing unit's row of store array as Point
+    Removed unit has no row, its last value is kept in unit.detached
+    '''
+    def fget(unit):
+        if unit.slot is None:
+            return unit.detached[field]
+        x, y = getattr(unit.session.units, field)[unit.slot].tolist()
+        return Point(x, y)
+    def fset(unit, point):
+        if unit.slot is None:
+            unit.detached[field] = Point(point.x, point.y)
+            return
+        getattr(unit.session.units, field)[unit.slot] = point.x, point.y
+    return property(fget, fset)
+
+def value_view(field):
+    '''Creates property exposing unit's item of store array
+    Removed unit has no row, its last value is kept in unit.detached
+    '''
+    def fget(unit):
+        if unit.slot is None:
+            return unit.detached[field]
+        return getattr(unit.session.units, field)[unit.slot].item()
+    def fset(unit, value):
+        if unit.slot is None:
+            unit.detached[field] = value
+            return
+        getattr(unit.session.units, field)[unit.slot] = value
+    return property(fget, fset)
+
+
+class UnitStore:
+    '''Kinematic state of all units kept in numpy arrays (one row per unit)
+    Units are views over their rows. Targets and swept windows of units that
+    move along a segment of their path for the whole tick are computed by
+    one vectorized pass. Such unit is moved to its target in its own update
+    (so in session's update order) if its window is free, the rest
+    (reaching node, waiting, colliding) move step by step.
+    session [Session] Game session
+    capacity [int](64) Initial num of rows, doubled when exceeded
+    '''
+    POINTS = ('coords', 'dest', 'node', 'direction')
+    VALUES = (('steps', int64), ('direction_cost', float), ('speed', float),
+        ('reach', int64), ('disk', int64), ('taken', int64))
+
+    def __init__(self, session, capacity=64):
+        self.session = session
+        self.units = [] # slot -> unit (None if free)
+        self.free = [] # Heap of free slots
+        self.alive = zeros(capacity, dtype=bool)
+        self.batched = zeros(capacity, dtype=bool) # Planned in this tick
+        self.window = zeros((capacity, 4), dtype=int64) # Swept subcells
+        for name in self.POINTS + ('target',):
+            setattr(self, name, zeros((capacity, 2)))
+        for name, dtype in self.VALUES:
+            setattr(self, name, zeros(capacity, dtype=dtype))
+
+    def add(self, unit, footprint):
+        '''Returns slot of new unit'''
+        if self.free:
+            slot = heappop(self.free)
+            self.units[slot] = unit
+        else:
+            slot = len(self.units)
+            self.units += [unit]
+            if slot >= len(self.alive):
+                self._grow()
+        disk = footprint.get_disks(self.session.request_subpercell()).shape[-1]
+        self.alive[slot] = True
+        self.batched[slot] = False
+        self.reach[slot] = (disk - 2) // 2
+        self.disk[slot] = disk
+        self.steps[slot] = 0
+        return slot
+
+    def remove(self, unit):
+        '''Frees slot of unit. Values of its row are copied to the unit,
+        as the slot may be reused by another unit.
+        '''
+        slot = unit.slot
+        if slot is None or self.units[slot] is not unit:
+            return
+        unit.detached = {name: Point(*getattr(self, name)[slot].tolist())
+            for name in self.POINTS}
+        unit.detached.update((name, getattr(self, name)[slot].item())
+            for name, dtype in self.VALUES)
+        unit.slot = None
+        self.alive[slot] = False
+        self.batched[slot] = False
+        self.units[slot] = None
+        heappush(self.free, slot)
+
+    def plan(self):
+        '''Selects units that stay on their current segment for the whole
+        tick and computes their targets. Called at start of tick.
+        '''
+        n = len(self.units)
+        steps, cost = self.steps[:n], self.direction_cost[:n]
+        moving = self.alive[:n] & (steps > 0) & \
+            (self.coords[:n] != self.dest[:n]).any(axis=1)
+        # Steps taken while spent points are below speed
+        with errstate(divide='ignore', invalid='ignore'):
+            taken = ceil((self.speed[:n] / cost).round(6))
+        taken[~moving] = 0
+        self.taken[:n] = taken
+        batched = moving & (steps >= taken)
+        last = steps == taken # Lands exactly on node
+        self.target[:n] = self.coords[:n] + \
+            taken[:, None] * self.direction[:n]
+        self.target[:n][last] = self.node[:n][last]
+        self.batched[:n] = batched
+        slots = flatnonzero(batched)
+        if len(slots):
+            self.window[slots] = stack(self._get_sweeps(slots), axis=1)
+
+    def advance(self, unit):
+        '''Moves unit to target computed by plan, called in unit's update
+        Returns False if unit was not planned or its swept window is not
+        free (then it moves step by step, as it would without plan)
+        '''
+        slot = unit.slot
+        if slot is None or not self.batched[slot]:
+            return False
+        self.batched[slot] = False
+        board = self.session.board
+        old = Point(*self.coords[slot].tolist())
+        new = Point(*self.target[slot].tolist())
+        window = tuple(self.window[slot].tolist())
+        if not board.is_window_free(unit, window) or \
+                not board.move_fp(unit, old, new):
+            return False
+        self.coords[slot] = self.target[slot]
+        self.steps[slot] -= self.taken[slot]
+        self.session.tell_moved(unit)
+        self.session.tell_tell_dirty()
+        return True
+
+    def _get_sweeps(self, slots):
+        '''Returns subcell windows (x0, y0, x1, y1 arrays) covering disk
+        masks of units at coords, target and all steps between them
+        '''
+        subs = self.session.request_subpercell()
+        reach, disk = self.reach[slots], self.disk[slots]
+        old = rint(self.coords[slots] * subs * PHASES).astype(int64) // PHASES
+        new = rint(self.target[slots] * subs * PHASES).astype(int64) // PHASES
+        lo, hi = minimum(old, new), maximum(old, new)
+        return lo[:, 0] - reach, lo[:, 1] - reach, \
+            hi[:, 0] - reach + disk, hi[:, 1] - reach + disk
+
+    def _grow(self):
+        size = 2 * len(self.alive)
+        for name in ('alive', 'batched', 'window', 'target') + \
+                self.POINTS + tuple(name for name, dtype in self.VALUES):
+            old = getattr(self, name)
+            new = zeros((size,) + old.shape[1:], dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)